@@ -1,11 +1,11 @@
 import json
 import logging
 import uuid
-import boto3
 import io
 import pandas as pd
 import os
 import ast
+from aws_clients import get_client
 
 # Get environment variables
 sfn_statemachine_name = os.environ['SFN_STATEMACHINE_NAME']
@@ -51,7 +51,7 @@ def lambda_handler(event, context):
         if subject_id:
             suffix = uuid.uuid1().hex[:6]  # to be used in resource names
             
-            sfn = boto3.client('stepfunctions')
+            sfn = get_client('stepfunctions')
 
             sfn_statemachine_arn = f'arn:aws:states:{region}:{account_id}:stateMachine:{sfn_statemachine_name}'
             
@@ -86,7 +86,7 @@ def lambda_handler(event, context):
     elif function == "analyze_imaging_biomarker":
         subject_id = None
         result = []
-        s3_client = boto3.client('s3')
+        s3_client = get_client('s3')
         for param in parameters:
             if param["name"] == "subject_id":
                 # Parse the string representation of the list
@@ -6,8 +6,8 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import io
-import boto3
 import ast
+from aws_clients import get_resource
 
 
 s3_bucket = os.environ['S3_BUCKET']
@@ -28,7 +28,7 @@ def bar_chart(title, x_values, y_values, x_label, y_label):
     img_data = io.BytesIO()
     fig.savefig(img_data, format='png')
     img_data.seek(0)
-    s3 = boto3.resource('s3')
+    s3 = get_resource('s3')
     bucket = s3.Bucket(s3_bucket)
     KEY = 'graphs/' + str(output_name)
     bucket.put_object(Body=img_data, ContentType='image/png', Key=KEY)
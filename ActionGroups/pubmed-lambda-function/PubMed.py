@@ -1,15 +1,27 @@
+import io
 import json
 import logging
+import os
+import re
 import time
 import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Iterator, List
 import xmltodict
+from article_parser import iter_articles
+from response_budget import budget_summaries, serialized_size
+from local_index import LocalIndex
+from timing import StageTimer
+from article_cache import ArticleCache, SQLiteArticleStore
+from eutils import EutilsSession, RetryPolicy
 
 
 logger = logging.getLogger(__name__)
 
+# Publication dates accepted by esearch mindate/maxdate
+DATE_FORMAT = re.compile(r"^\d{4}(/(0[1-9]|1[0-2])(/(0[1-9]|[12]\d|3[01]))?)?$")
+
 class PubMed():
     """
     Calls pubmed API to fetch biomedical literature.
@@ -23,54 +35,223 @@ class PubMed():
     sleep_time: float = 0.2
     
     top_k_results: int = 5
+    max_results_limit: int = 200
+    max_batch_size: int = 200
+    # Seconds of the time budget below which no further result page is started
+    page_time_reserve: float = 1.5
+    sort_orders = ("relevance", "pub_date")
     MAX_QUERY_LENGTH: int = 300
-    doc_content_chars_max: int = 10000
+    # Bytes of the serialized response body returned to the agent, below the
+    # 25 KB Bedrock Agents accept from an action group
+    max_response_bytes: int = int(os.environ.get("PUBMED_RESPONSE_BYTES", "20000"))
+    max_article_lookup: int = 20
     email: str = "email@example.com"
+    api_key: str = os.environ.get("NCBI_API_KEY", "")
+    max_workers: int = 4
+    article_cache_path: str = os.environ.get("ARTICLE_CACHE_PATH", "/tmp/pubmed_articles.sqlite3")
+    article_cache_bytes: int = int(os.environ.get("ARTICLE_CACHE_BYTES", str(8 * 1024 * 1024)))
+    query_cache_ttl: float = float(os.environ.get("QUERY_CACHE_TTL", "3600"))
+    # "stream" extracts only the used fields while parsing; "xmltodict" builds the full document
+    # with the fast mode of the bundled xmltodict
+    xml_parser: str = os.environ.get("PUBMED_XML_PARSER", "stream")
 
+    def __init__(self):
+        # NCBI allows 10 requests per second with an API key and 3 without
+        self.session = EutilsSession(10 if self.api_key else 3)
+        self.retry_policy = RetryPolicy(max_attempts=self.max_retry + 1, base_delay=self.sleep_time)
+        self.deadline = None
+        self.timer = StageTimer()
+        self.cache = ArticleCache(
+            max_bytes=self.article_cache_bytes,
+            query_ttl=self.query_cache_ttl,
+            store=SQLiteArticleStore(self.article_cache_path) if self.article_cache_path else None,
+        )
+        # Every fetched article is indexed; articles persisted by earlier containers are indexed at start
+        self.index = LocalIndex()
+        self.index.add(self.cache.stored_articles())
 
-    
-    def run(self, query: str) -> str:
+    def set_time_budget(self, seconds: float = None) -> None:
+        """
+        Limit the total time, retries included, that the following requests
+        may take; ``None`` removes the limit. Set once per invocation.
+        """
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def run(
+        self,
+        query: str,
+        max_results: int = None,
+        sort: str = "relevance",
+        min_date: str = None,
+        max_date: str = None,
+        max_bytes: int = None,
+    ) -> str:
         """
         Run PubMed search and get the article meta information.
+        Summaries are shortened, and the lowest ranked articles dropped, so
+        that the serialized list takes at most ``max_bytes`` bytes,
+        ``max_response_bytes`` by default.
         """
 
         try:
             docs = []
-            for result in self.load(query[: self.MAX_QUERY_LENGTH]):
-                docs.append({
-                    "Link": 'https://pubmed.ncbi.nlm.nih.gov/' + result["uid"],
-                    "Published": result["Published"],
-                    "Title": result["Title"],
-                    "Summary": result["Summary"]
-                })
+            results = self.search(
+                query[: self.MAX_QUERY_LENGTH], max_results, sort, min_date, max_date
+            )
+            for result in results:
+                docs.append(self._format_doc(result))
 
             return (
-                docs
+                budget_summaries(docs, max_bytes or self.max_response_bytes)
                 if docs
                 else "No good PubMed Result was found"
             )
         except Exception as ex:
             return f"PubMed exception: {ex}"
-            
+
+    def run_many(self, queries: List[str]) -> List[Any]:
+        """
+        Run several PubMed searches concurrently, e.g. one per candidate
+        biomarker. Return one result of ``run`` per query, in order.
+        """
+        if not queries:
+            return []
+        # The response budget is shared by all queries, after the
+        # {"query": ..., "result": ...} entries lambda_function wraps them in
+        wrappers = sum(serialized_size({"query": query, "result": ""}) + 2 for query in queries)
+        max_bytes = (self.max_response_bytes - wrappers) // len(queries)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries))) as executor:
+            return list(executor.map(lambda query: self.run(query, max_bytes=max_bytes), queries))
+
+    def get_articles(self, pmids: List[str]) -> Any:
+        """
+        Return the full, unshortened records of the given PubMed IDs, e.g.
+        of articles marked as truncated in a search response.
+        """
+        try:
+            pmids = [str(pmid).strip() for pmid in pmids][: self.max_article_lookup]
+            docs = [self._format_doc(result) for result in self._load_articles(pmids)]
+            # Whole records only; the ones that do not fit can be asked for again
+            while len(docs) > 1 and serialized_size(docs) > self.max_response_bytes:
+                logger.warning(f"Leaving out article {docs.pop()['Link']} to fit the response size")
+            return docs if docs else "No PubMed article was found"
+        except Exception as ex:
+            return f"PubMed exception: {ex}"
+
+    def search_local(self, query: str, max_results: int = None, fresh: bool = False) -> Any:
+        """
+        Answer a query from the local index of already fetched abstracts,
+        falling back to a PubMed search when the index has no good match
+        or ``fresh`` results are requested.
+        """
+        max_results = min(int(max_results or self.top_k_results), self.max_results_limit)
+        # The results list replaces the two quotes of the empty string
+        max_bytes = self.max_response_bytes - serialized_size({"source": "local index", "results": ""}) + 2
+        if not fresh:
+            hits = self.index.search(query[: self.MAX_QUERY_LENGTH], max_results)
+            if hits:
+                docs = [self._format_doc(article) for _, article in hits]
+                return {
+                    "source": "local index",
+                    "results": budget_summaries(docs, max_bytes),
+                }
+        return {"source": "pubmed", "results": self.run(query, max_results=max_results, max_bytes=max_bytes)}
+
+    @staticmethod
+    def _format_doc(result: dict) -> dict:
+        return {
+            "Link": 'https://pubmed.ncbi.nlm.nih.gov/' + result["uid"],
+            "Published": result["Published"],
+            "Title": result["Title"],
+            "Summary": result["Summary"]
+        }
+
     def lazy_load(self, query: str) -> Iterator[dict]:
         """
         Search PubMed for documents matching the query.
         Return an iterator of dictionaries containing the document metadata.
         """
+        return self.search(query, self.top_k_results)
 
-        url = (
-            self.base_url_esearch
-            + "db=pubmed&term="
-            + str({urllib.parse.quote(query)})
-            + f"&retmode=json&retmax={self.top_k_results}&usehistory=y"
-        )
-        result = urllib.request.urlopen(url)
-        text = result.read().decode("utf-8")
-        json_text = json.loads(text)
+    def search(
+        self,
+        query: str,
+        max_results: int = None,
+        sort: str = "relevance",
+        min_date: str = None,
+        max_date: str = None,
+    ) -> Iterator[dict]:
+        """
+        Page through the esearch results with retstart/retmax and yield the
+        articles in ranking order, at most ``max_results`` of them (capped at
+        ``max_results_limit``). ``sort`` is "relevance" or "pub_date" and
+        ``min_date``/``max_date`` (YYYY, YYYY/MM or YYYY/MM/DD) filter on the
+        publication date. When the time budget runs low the search stops
+        early and keeps the articles already yielded.
+        """
+        if sort not in self.sort_orders:
+            raise ValueError(f"sort must be one of {', '.join(self.sort_orders)}")
+        for date in (min_date, max_date):
+            if date and not DATE_FORMAT.match(date):
+                raise ValueError(f"Invalid date {date!r}, expected YYYY, YYYY/MM or YYYY/MM/DD")
+        max_results = min(int(max_results or self.top_k_results), self.max_results_limit)
+        options = "&sort=" + sort
+        if min_date or max_date:
+            options += (
+                "&datetype=pdat&mindate="
+                + urllib.parse.quote(min_date or "1800")
+                + "&maxdate="
+                + urllib.parse.quote(max_date or "3000")
+            )
 
-        webenv = json_text["esearchresult"]["webenv"]
-        for uid in json_text["esearchresult"]["idlist"]:
-            yield self.retrieve_article(uid, webenv)
+        yielded = 0
+        retstart = 0
+        while yielded < max_results:
+            if self.deadline is not None and self.deadline - time.monotonic() < self.page_time_reserve:
+                logger.warning(f"Time budget low, returning {yielded} of {max_results} results")
+                return
+            retmax = min(self.max_batch_size, max_results - yielded)
+            cache_key = f"{query}{options}&retstart={retstart}"
+            with self.timer.span("cache"):
+                uids = self.cache.get_query(cache_key, retmax)
+            try:
+                if uids is None:
+                    url = (
+                        self.base_url_esearch
+                        + "db=pubmed&term="
+                        + urllib.parse.quote(query)
+                        + options
+                        + f"&retmode=json&retstart={retstart}&retmax={retmax}"
+                    )
+                    json_text = json.loads(self._fetch(url, "esearch"))
+                    uids = json_text["esearchresult"]["idlist"]
+                    self.cache.put_query(cache_key, retmax, uids)
+
+                for article in self._load_articles(uids):
+                    yield article
+                    yielded += 1
+            except TimeoutError:
+                if not yielded:
+                    raise
+                logger.warning(f"Time budget exhausted, returning {yielded} of {max_results} results")
+                return
+            if len(uids) < retmax:
+                return
+            retstart += len(uids)
+
+    def _load_articles(self, uids: List[str]) -> Iterator[dict]:
+        for start in range(0, len(uids), self.max_batch_size):
+            batch = uids[start : start + self.max_batch_size]
+            # Cached articles skip both the efetch request and the XML parsing
+            with self.timer.span("cache"):
+                articles = self.cache.get_articles(batch)
+            missing = [uid for uid in batch if uid not in articles]
+            if missing:
+                fetched = self.retrieve_articles(missing)
+                self.cache.put_articles(fetched)
+                articles.update((article["uid"], article) for article in fetched)
+            self.index.add(articles.values())
+            yield from (articles[uid] for uid in batch if uid in articles)
 
     def load(self, query: str) -> List[dict]:
         """
@@ -82,36 +263,72 @@ class PubMed():
         return data
 
     def retrieve_article(self, uid: str, webenv: str) -> dict:
+        return self.retrieve_articles([uid], webenv)[0]
+
+    def retrieve_articles(self, uids: List[str], webenv: str = "") -> List[dict]:
+        """
+        Fetch several articles with a single efetch request.
+        Return the parsed articles in the order of ``uids``; UIDs that
+        efetch did not return are skipped.
+        """
         url = (
             self.base_url_efetch
             + "db=pubmed&retmode=xml&id="
-            + uid
-            + "&webenv="
-            + webenv
+            + ",".join(uids)
+            + ("&webenv=" + webenv if webenv else "")
         )
+        data = self._fetch(url, "efetch")
+        with self.timer.span("parse"):
+            if self.xml_parser == "xmltodict":
+                # _parse_article only reads the Label attribute
+                parsed = self._parse_articles(xmltodict.parse(data, fast=True, attr_whitelist=("Label",)))
+            else:
+                parsed = iter_articles(io.BytesIO(data))
+            articles = {article["uid"]: article for article in parsed}
+        self.timer.add("parse", articles=len(articles))
+        return [articles[uid] for uid in uids if uid in articles]
 
-        retry = 0
-        while True:
-            try:
-                result = urllib.request.urlopen(url)
-                break
-            except urllib.error.HTTPError as e:
-                if e.code == 429 and retry < self.max_retry:
-                    # Too Many Requests errors
-                    # wait for an exponentially increasing amount of time
-                    logger.warning( 
-                        f"Too Many Requests, "
-                        f"waiting for {self.sleep_time:.2f} seconds..."
-                    )
-                    time.sleep(self.sleep_time)
-                    self.sleep_time *= 2
-                    retry += 1
-                else:
-                    raise e
-
-        xml_text = result.read().decode("utf-8")
-        text_dict = xmltodict.parse(xml_text)
-        return self._parse_article(uid, text_dict)
+    def _fetch(self, url: str, stage: str) -> bytes:
+        if self.api_key:
+            url += "&api_key=" + urllib.parse.quote(self.api_key)
+        with self.timer.span(stage):
+            data = self.retry_policy.call(
+                lambda: self.session.get(url, timeout=self._remaining_time()),
+                deadline=self.deadline,
+                on_retry=lambda: self.timer.add(stage, retries=1),
+            )
+        self.timer.add(stage, bytes=len(data))
+        return data
+
+    def _remaining_time(self) -> float:
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("PubMed time budget exhausted")
+        return remaining
+
+    def _parse_articles(self, text_dict: dict) -> List[dict]:
+        """
+        Split a PubmedArticleSet into per-article records. xmltodict returns a
+        dict for a single article and a list when several were fetched.
+        """
+        article_set = text_dict.get("PubmedArticleSet") or {}
+        articles = []
+        for tag, document in (
+            ("PubmedArticle", "MedlineCitation"),
+            ("PubmedBookArticle", "BookDocument"),
+        ):
+            records = article_set.get(tag) or []
+            if isinstance(records, dict):
+                records = [records]
+            for record in records:
+                pmid = record[document]["PMID"]
+                uid = pmid["#text"] if isinstance(pmid, dict) else pmid
+                articles.append(
+                    self._parse_article(uid, {"PubmedArticleSet": {tag: record}})
+                )
+        return articles
 
     def _parse_article(self, uid: str, text_dict: dict) -> dict:
         try:
@@ -0,0 +1,188 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class SQLiteArticleStore:
+    """
+    Persistent cache tier keeping parsed articles and search results in a
+    SQLite file, e.g. under /tmp so warm containers share it across
+    invocations.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS articles (uid TEXT PRIMARY KEY, stored_at REAL, data TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, stored_at REAL, uids TEXT)"
+            )
+
+    def get_articles(self, uids: List[str]) -> Dict[str, Tuple[float, str]]:
+        if not uids:
+            return {}
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uid, stored_at, data FROM articles WHERE uid IN (%s)" % ",".join("?" * len(uids)),
+                uids,
+            ).fetchall()
+        return {uid: (stored_at, data) for uid, stored_at, data in rows}
+
+    def put_articles(self, entries: Iterable[Tuple[str, float, str]]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO articles (uid, stored_at, data) VALUES (?, ?, ?)", entries
+            )
+
+    def iter_articles(self, ttl: float) -> Iterator[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT data FROM articles WHERE stored_at >= ? ORDER BY stored_at", (time.time() - ttl,)
+            ).fetchall()
+        return (data for data, in rows)
+
+    def get_query(self, key: str) -> Optional[Tuple[float, str]]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT stored_at, uids FROM queries WHERE key = ?", (key,)
+            ).fetchone()
+
+    def put_query(self, key: str, stored_at: float, uids: str) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO queries (key, stored_at, uids) VALUES (?, ?, ?)",
+                (key, stored_at, uids),
+            )
+
+    def prune(self, article_ttl: float, query_ttl: float) -> None:
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM articles WHERE stored_at < ?", (now - article_ttl,))
+            self.connection.execute("DELETE FROM queries WHERE stored_at < ?", (now - query_ttl,))
+
+
+class ArticleCache:
+    """
+    Cache of parsed PubMed articles keyed by PMID, plus a cache of search
+    results mapping a query to its PMID list.
+
+    The in-memory tier evicts least recently used articles once their
+    serialized size exceeds ``max_bytes``; the optional ``store`` is a
+    SQLiteArticleStore shared by later containers on the same file system.
+    Search results expire after ``query_ttl`` seconds, articles, which
+    rarely change, after ``ttl``. Cached articles are returned as parsed
+    records, so hits skip both the network and the XML parsing.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 7 * 24 * 3600,
+                 query_ttl: float = 3600, max_queries: int = 256, store: SQLiteArticleStore = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.query_ttl = query_ttl
+        self.max_queries = max_queries
+        self.store = store
+        self.lock = threading.Lock()
+        self._articles = OrderedDict()
+        self._queries = OrderedDict()
+        self.size = 0
+        self.stats = {"hits": 0, "store_hits": 0, "misses": 0, "query_hits": 0, "query_misses": 0}
+        if store is not None:
+            store.prune(ttl, query_ttl)
+
+    @staticmethod
+    def query_key(query: str, retmax: int) -> str:
+        return "%d:%s" % (retmax, re.sub(r"\s+", " ", query.strip().lower()))
+
+    def get_articles(self, uids: List[str]) -> Dict[str, dict]:
+        """Return the cached articles among ``uids``, keyed by PMID."""
+        now = time.time()
+        found = {}
+        with self.lock:
+            for uid in uids:
+                entry = self._articles.get(uid)
+                if entry is not None and now - entry[0] < self.ttl:
+                    self._articles.move_to_end(uid)
+                    found[uid] = entry[1]
+            self.stats["hits"] += len(found)
+        missing = [uid for uid in uids if uid not in found]
+        if missing and self.store is not None:
+            stored = {
+                uid: (stored_at, json.loads(data))
+                for uid, (stored_at, data) in self.store.get_articles(missing).items()
+                if now - stored_at < self.ttl
+            }
+            with self.lock:
+                for uid, (stored_at, article) in stored.items():
+                    self._remember(uid, stored_at, article)
+                    found[uid] = article
+                self.stats["store_hits"] += len(stored)
+        with self.lock:
+            self.stats["misses"] += len(uids) - len(found)
+        return found
+
+    def put_articles(self, articles: List[dict]) -> None:
+        stored_at = time.time()
+        with self.lock:
+            for article in articles:
+                self._remember(article["uid"], stored_at, article)
+        if self.store is not None and articles:
+            self.store.put_articles(
+                (article["uid"], stored_at, json.dumps(article)) for article in articles
+            )
+
+    def stored_articles(self) -> Iterator[dict]:
+        """Iterate over the unexpired articles of the persistent tier, oldest first."""
+        if self.store is None:
+            return iter(())
+        return (json.loads(data) for data in self.store.iter_articles(self.ttl))
+
+    def get_query(self, query: str, retmax: int) -> Optional[List[str]]:
+        key = self.query_key(query, retmax)
+        now = time.time()
+        with self.lock:
+            entry = self._queries.get(key)
+        if entry is None and self.store is not None:
+            row = self.store.get_query(key)
+            entry = (row[0], json.loads(row[1])) if row is not None else None
+        with self.lock:
+            if entry is None or now - entry[0] >= self.query_ttl:
+                self.stats["query_misses"] += 1
+                return None
+            self._queries[key] = entry
+            self._queries.move_to_end(key)
+            self._trim_queries()
+            self.stats["query_hits"] += 1
+        return entry[1]
+
+    def put_query(self, query: str, retmax: int, uids: List[str]) -> None:
+        key = self.query_key(query, retmax)
+        stored_at = time.time()
+        with self.lock:
+            self._queries[key] = (stored_at, list(uids))
+            self._queries.move_to_end(key)
+            self._trim_queries()
+        if self.store is not None:
+            self.store.put_query(key, stored_at, json.dumps(list(uids)))
+
+    def _remember(self, uid: str, stored_at: float, article: dict) -> None:
+        if uid in self._articles:
+            self.size -= self._articles.pop(uid)[2]
+        size = len(json.dumps(article))
+        if size > self.max_bytes:
+            return
+        self._articles[uid] = (stored_at, article, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            self.size -= self._articles.popitem(last=False)[1][2]
+
+    def _trim_queries(self) -> None:
+        while len(self._queries) > self.max_queries:
+            self._queries.popitem(last=False)
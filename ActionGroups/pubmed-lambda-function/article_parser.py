@@ -0,0 +1,60 @@
+import xml.etree.ElementTree as ET
+from typing import IO, Iterator
+
+# Element holding the article fields, relative to each record element
+ARTICLE_PATHS = {"PubmedArticle": "MedlineCitation/Article", "PubmedBookArticle": "BookDocument"}
+PMID_PATHS = {"PubmedArticle": "MedlineCitation/PMID", "PubmedBookArticle": "BookDocument/PMID"}
+
+
+def _last(elements: list):
+    """The last of ``elements``; like the xmltodict parser, later elements win over earlier ones."""
+    return elements[-1] if elements else None
+
+
+def _record(element: ET.Element) -> dict:
+    pmid = _last(element.findall(PMID_PATHS[element.tag]))
+    article = element.find(ARTICLE_PATHS[element.tag])
+    if article is None:
+        # A record without article fields gives empty ones
+        article = ET.Element(element.tag)
+    title = _last(article.findall("ArticleTitle"))
+    sections = []
+    for text_element in article.iterfind("Abstract/AbstractText"):
+        text = "".join(text_element.itertext()).strip()
+        label = text_element.get("Label")
+        sections.append(f"{label}: {text}" if label else text)
+    copyright = _last(article.findall("Abstract/CopyrightInformation"))
+    date = {part.tag: part.text or "" for part in article.iterfind("ArticleDate/*")}
+    return {
+        "uid": (pmid.text or "").strip() if pmid is not None else "",
+        "Title": "".join(title.itertext()).strip() if title is not None else "",
+        "Published": "-".join([date.get("Year", ""), date.get("Month", ""), date.get("Day", "")]),
+        "Copyright Information": (copyright.text or "").strip() if copyright is not None else "",
+        "Summary": "\n".join(sections) if sections else "No abstract available",
+    }
+
+
+def iter_articles(source: IO[bytes]) -> Iterator[dict]:
+    """
+    Stream the articles of an efetch PubmedArticleSet.
+
+    Only the fields used by ``PubMed.run`` are extracted: PMID, title,
+    abstract, article date and copyright. Each PubmedArticle or
+    PubmedBookArticle is read with ElementTree's path lookups when its end
+    tag is reached, then yielded and cleared, so memory use does not grow
+    with the size of the response. Elements outside these records are not
+    looked at.
+    """
+    root = None
+    depth = 0
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1 and element.tag in ARTICLE_PATHS:
+            yield _record(element)
+            # Drop the finished article from the tree
+            root.clear()
@@ -0,0 +1,168 @@
+import http.client
+import io
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how many requests are started per second.
+
+    NCBI allows 3 requests per second without an API key and 10 with one;
+    ``acquire`` blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetryPolicy:
+    """
+    Retry schedule for transient E-utilities failures.
+
+    The policy holds no per-request state: every ``call`` counts its own
+    attempts, so backoff never carries over to later requests or warm
+    invocations. Delays grow exponentially with full jitter, a
+    ``Retry-After`` header is honored as the minimum wait, and no retry is
+    started that would end past the caller's deadline.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 0.2, max_delay: float = 5.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, urllib.error.HTTPError):
+            return error.code in self.RETRY_STATUSES
+        # Connection errors, resets and socket timeouts
+        return isinstance(error, (OSError, http.client.HTTPException))
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = None
+        if isinstance(error, urllib.error.HTTPError) and error.headers is not None:
+            try:
+                retry_after = float(error.headers.get("Retry-After"))
+            except (TypeError, ValueError):
+                pass
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+    def call(self, function, deadline: float = None, on_retry=None):
+        """
+        Call ``function`` until it succeeds, retrying transient errors until
+        ``deadline`` (monotonic). ``on_retry`` is called before every retry.
+        """
+        attempt = 0
+        while True:
+            try:
+                return function()
+            except Exception as error:
+                attempt += 1
+                if attempt >= self.max_attempts or not self.is_retryable(error):
+                    raise
+                delay = self.delay(attempt - 1, error)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                logger.warning(
+                    f"{error}, retrying in {delay:.2f} seconds "
+                    f"(attempt {attempt + 1} of {self.max_attempts})..."
+                )
+                if on_retry is not None:
+                    on_retry()
+                time.sleep(delay)
+
+
+class EutilsSession:
+    """
+    Rate-limited HTTP client for the E-utilities endpoints.
+
+    Requests are spaced evenly at ``requests_per_second``: the token bucket
+    holds a single token, so no burst can put more requests than allowed
+    into any one-second window. Every thread keeps its own keep-alive connection per host, so the
+    esearch and efetch calls of a lookup reuse one TCP/TLS connection
+    instead of opening a new one per request. HTTP error statuses are
+    raised as ``urllib.error.HTTPError`` like ``urllib.request.urlopen``.
+    """
+
+    def __init__(self, requests_per_second: float, timeout: float = 10.0):
+        self.limiter = TokenBucket(requests_per_second, capacity=1)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def get(self, url: str, timeout: float = None) -> bytes:
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        self.limiter.acquire()
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc)
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request("GET", path, headers={"Connection": "keep-alive"})
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self._close(parts.scheme, parts.netloc)
+                if attempt:
+                    raise
+            except Exception:
+                # A timed out or half-read response leaves the connection unusable
+                self._close(parts.scheme, parts.netloc)
+                raise
+        if response.status >= 400:
+            raise urllib.error.HTTPError(
+                url, response.status, response.reason, response.headers, io.BytesIO(body)
+            )
+        return body
+
+    def _connections(self) -> dict:
+        if not hasattr(self.local, "connections"):
+            self.local.connections = {}
+        return self.local.connections
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        connections = self._connections()
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            )
+            connection = connection_class(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = connection
+        return connection
+
+    def _close(self, scheme: str, netloc: str) -> None:
+        connection = self._connections().pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
@@ -1,10 +1,29 @@
+import ast
 import json
 import logging
+import os
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
 from PubMed import PubMed
+from response_budget import limit_body
 pubmed = PubMed()
+# Seconds kept free at the end of the invocation to build the response
+RESPONSE_MARGIN = 2.0
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "BiomarkerAgent/PubMed")
+# Print a per-stage summary of every invocation, e.g. when running against a local stub
+TIMING_SUMMARY = os.environ.get("PUBMED_TIMING_SUMMARY", "false").lower() == "true"
+
+
+def parse_list(value):
+    """Parse a list parameter, sent by the agent as a JSON or Python list literal."""
+    try:
+        values = json.loads(value)
+    except json.JSONDecodeError:
+        values = ast.literal_eval(value)
+    if isinstance(values, (str, int)):
+        values = [values]
+    return list(values)
 
 
 def lambda_handler(event, context):
@@ -14,17 +33,55 @@ def lambda_handler(event, context):
     api_path = event["apiPath"]
     parameters = event["parameters"]
     http_method = event["httpMethod"]
-    
+    pubmed.timer.reset()
+    pubmed.set_time_budget(
+        context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN if context else None
+    )
+
     if api_path == "/query-pubmed":
-        body = pubmed.run(parameters[0]["value"])
-        response_body = {"application/json": {"body": str(body)}}
+        options = {parameter["name"]: parameter["value"] for parameter in parameters}
+        body = pubmed.run(
+            options.get("query", parameters[0]["value"]),
+            max_results=options.get("max_results"),
+            sort=options.get("sort", "relevance"),
+            min_date=options.get("min_date"),
+            max_date=options.get("max_date"),
+        )
+        response_code = 200
+    elif api_path == "/query-pubmed/batch":
+        queries = parse_list(parameters[0]["value"])
+        body = [
+            {"query": query, "result": result}
+            for query, result in zip(queries, pubmed.run_many(queries))
+        ]
+        response_code = 200
+    elif api_path == "/search-local":
+        options = {parameter["name"]: parameter["value"] for parameter in parameters}
+        body = pubmed.search_local(
+            options.get("query", parameters[0]["value"]),
+            max_results=options.get("max_results"),
+            fresh=str(options.get("fresh", "false")).lower() == "true",
+        )
+        response_code = 200
+    elif api_path == "/pubmed-articles":
+        body = pubmed.get_articles(parse_list(parameters[0]["value"]))
         response_code = 200
     else:
         # If the api path is not recognized, return an error message
         body = {"{}::{} is not a valid api, try another one.".format(action, api_path)}
         response_code = 400
-        response_body = {"application/json": {"body": str(body)}}
-    
+
+    with pubmed.timer.span("serialize"):
+        text = str(body)
+        if len(text.encode("utf-8")) > pubmed.max_response_bytes:
+            logger.error(f"Response body over {pubmed.max_response_bytes} bytes, cutting it")
+            text = limit_body(text, pubmed.max_response_bytes)
+        response_body = {"application/json": {"body": text}}
+    pubmed.timer.add("serialize", bytes=len(response_body["application/json"]["body"].encode("utf-8")))
+    pubmed.timer.emit(METRICS_NAMESPACE, {"ApiPath": api_path})
+    if TIMING_SUMMARY:
+        print(pubmed.timer.summary())
+
     logger.info(f"Response body: {response_body}")
 
     action_response = {
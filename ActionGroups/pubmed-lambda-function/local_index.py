@@ -0,0 +1,109 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Tuple
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "about", "according", "after", "all", "also", "an", "and", "any", "are", "article", "articles",
+    "as", "at", "be", "been", "between", "but", "by", "can", "could", "did", "do", "does", "evidence",
+    "find", "for", "from", "has", "have", "how", "if", "in", "into", "is", "it", "its", "literature",
+    "me", "more", "most", "of", "on", "or", "other", "our", "paper", "papers", "published", "research",
+    "show", "shows", "studies", "study", "such", "tell", "than", "that", "the", "their", "there", "these",
+    "they", "this", "to", "was", "we", "were", "what", "when", "which", "while", "who", "why", "will",
+    "with", "within", "would",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words, with a trailing plural "s" removed."""
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class LocalIndex:
+    """
+    In-memory BM25 index over the titles and abstracts of fetched articles.
+
+    Articles are added as a side effect of every fetch, so follow-up
+    questions about literature already retrieved in this container can be
+    answered without E-utilities. At most ``max_documents`` articles are
+    kept; the ones added first are dropped first.
+    """
+
+    def __init__(self, max_documents: int = 5000, k1: float = 1.5, b: float = 0.75):
+        self.max_documents = max_documents
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.documents = OrderedDict()
+        self.postings = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, articles: Iterable[dict]) -> None:
+        with self.lock:
+            for article in articles:
+                uid = article["uid"]
+                if uid in self.documents:
+                    continue
+                # Title words count twice
+                terms = Counter(tokenize(article.get("Title", "")) * 2 + tokenize(article.get("Summary", "")))
+                self.documents[uid] = (article, terms, sum(terms.values()))
+                self.total_length += sum(terms.values())
+                for term, frequency in terms.items():
+                    self.postings.setdefault(term, {})[uid] = frequency
+                while len(self.documents) > self.max_documents:
+                    self._remove(next(iter(self.documents)))
+
+    def search(self, query: str, limit: int = 5, min_coverage: float = 2 / 3) -> List[Tuple[float, dict]]:
+        """
+        Return up to ``limit`` (score, article) pairs ranked by BM25. Only
+        articles containing at least ``min_coverage`` of the distinct query
+        terms are returned, so an empty list means the index cannot answer.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self.lock:
+            count = len(self.documents)
+            if not count:
+                return []
+            average_length = self.total_length / count
+            scores = {}
+            matched = Counter()
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for uid, frequency in postings.items():
+                    length = self.documents[uid][2]
+                    norm = frequency + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[uid] = scores.get(uid, 0.0) + idf * frequency * (self.k1 + 1) / norm
+                    matched[uid] += 1
+            required = math.ceil(min_coverage * len(terms))
+            ranked = sorted(
+                (uid for uid in scores if matched[uid] >= required),
+                key=lambda uid: scores[uid],
+                reverse=True,
+            )
+            return [(scores[uid], self.documents[uid][0]) for uid in ranked[:limit]]
+
+    def _remove(self, uid: str) -> None:
+        _, terms, length = self.documents.pop(uid)
+        self.total_length -= length
+        for term in terms:
+            postings = self.postings[term]
+            del postings[uid]
+            if not postings:
+                del self.postings[term]
@@ -0,0 +1,141 @@
+import re
+from typing import List
+
+SECTION = re.compile(r"^([A-Z][A-Z0-9 ,&/-]*): ")
+# Structured abstract sections kept first when a summary has to be shortened
+SECTION_PRIORITY = {
+    "CONCLUSIONS": 0, "CONCLUSION": 0, "INTERPRETATION": 0,
+    "RESULTS": 1, "FINDINGS": 1,
+}
+ELLIPSIS = " [...]"
+# Smallest summary share worth returning; documents are dropped below it
+MIN_SUMMARY_BYTES = 200
+
+
+def _split_sections(summary: str) -> List[str]:
+    """Split a summary built from labeled AbstractText elements into its sections."""
+    sections = []
+    for line in summary.split("\n"):
+        if sections and not SECTION.match(line):
+            sections[-1] += "\n" + line
+        else:
+            sections.append(line)
+    return sections
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= len(ELLIPSIS):
+        return ""
+    cut = text[: limit - len(ELLIPSIS)]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut + ELLIPSIS
+
+
+def shorten_summary(summary: str, limit: int) -> str:
+    """
+    Shorten a summary to at most ``limit`` characters. Whole sections are
+    kept by priority (conclusions, then results, then the rest in order)
+    and the first section that does not fit is truncated; the kept
+    sections stay in their original order.
+    """
+    if len(summary) <= limit:
+        return summary
+    sections = _split_sections(summary)
+    order = sorted(
+        range(len(sections)),
+        key=lambda i: (SECTION_PRIORITY.get(_label(sections[i]), 2), i),
+    )
+    kept = {}
+    remaining = limit
+    for i in order:
+        cost = len(sections[i]) + (1 if kept else 0)
+        if cost <= remaining:
+            kept[i] = sections[i]
+            remaining -= cost
+        else:
+            text = _truncate(sections[i], remaining - (1 if kept else 0))
+            if text:
+                kept[i] = text
+            break
+    return "\n".join(kept[i] for i in sorted(kept))
+
+
+def _label(section: str) -> str:
+    match = SECTION.match(section)
+    return match.group(1) if match else ""
+
+
+def serialized_size(value) -> int:
+    """Size in bytes of ``value`` as serialized into the response body with str()."""
+    return len(str(value).encode("utf-8"))
+
+
+def budget_summaries(docs: List[dict], max_bytes: int) -> List[dict]:
+    """
+    Shorten the summaries of ``docs`` so that the serialized list, titles,
+    links and all other fields included, takes at most ``max_bytes`` bytes.
+
+    The size of every document without its summary is taken off the budget
+    first; when that leaves less than ``MIN_SUMMARY_BYTES`` per document the
+    lowest ranked documents are dropped. The rest is shared out evenly and
+    what short abstracts leave unused goes to the longer ones. Shortened
+    documents are marked with ``"Truncated": True``; their full abstracts
+    can be fetched by PMID.
+    """
+    if serialized_size(docs) <= max_bytes:
+        return docs
+    # Every document is measured as if truncated; ", " separates it from the previous one
+    overheads = [serialized_size(dict(doc, Summary="", Truncated=True)) + 2 for doc in docs]
+    count = len(docs)
+    while count and sum(overheads[:count]) + count * MIN_SUMMARY_BYTES > max_bytes:
+        count -= 1
+    docs, overheads = docs[:count], overheads[:count]
+    available = max_bytes - sum(overheads)
+
+    budgeted = _share(docs, available)
+    # Escaped characters and multi-byte UTF-8 make the serialized summaries
+    # longer than their character count; shrink until the list fits
+    excess = serialized_size(budgeted) - max_bytes
+    while excess > 0 and available > 0:
+        available -= excess
+        budgeted = _share(docs, available)
+        excess = serialized_size(budgeted) - max_bytes
+    while budgeted and serialized_size(budgeted) > max_bytes:
+        budgeted.pop()
+    return budgeted
+
+
+def limit_body(body: str, max_bytes: int) -> str:
+    """
+    Last-resort cut of a serialized response body to ``max_bytes`` bytes,
+    for bodies that the document budgets above did not bring under the limit.
+    """
+    data = body.encode("utf-8")
+    if len(data) <= max_bytes:
+        return body
+    marker = ELLIPSIS + " (response cut to the size limit)"
+    return data[: max_bytes - len(marker.encode("utf-8"))].decode("utf-8", errors="ignore") + marker
+
+
+def _share(docs: List[dict], available: int) -> List[dict]:
+    """Shorten the summaries to share ``available`` serialized bytes between them."""
+    # repr adds the two quotes that are already counted in the overhead
+    lengths = [serialized_size(repr(doc["Summary"])) - 2 for doc in docs]
+    shares = [0] * len(docs)
+    remaining = max(available, 0)
+    # Hand out the budget from the shortest summary up
+    order = sorted(range(len(docs)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        shares[i] = min(lengths[i], remaining // (len(docs) - position))
+        remaining -= shares[i]
+
+    budgeted = []
+    for doc, length, share in zip(docs, lengths, shares):
+        if length > share:
+            doc = dict(doc, Summary=shorten_summary(doc["Summary"], share), Truncated=True)
+        budgeted.append(doc)
+    return budgeted
@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Counters other than durations, with their CloudWatch units
+COUNTER_UNITS = {"bytes": "Bytes", "calls": "Count", "retries": "Count", "articles": "Count"}
+
+
+class StageTimer:
+    """
+    Collects per-stage timings and counters for one invocation.
+
+    ``span`` times a stage and counts its calls; ``add`` adds counters such
+    as bytes transferred or retries to a stage. Spans running concurrently
+    on several threads add up, so a stage can take longer than the
+    invocation itself. ``emf`` returns the totals as a CloudWatch embedded
+    metric format record.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.started_at = time.perf_counter()
+            self.stages = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, ms=(time.perf_counter() - start) * 1000, calls=1)
+
+    def add(self, stage: str, **counters) -> None:
+        with self.lock:
+            totals = self.stages.setdefault(stage, {})
+            for name, value in counters.items():
+                totals[name] = totals.get(name, 0) + value
+
+    def emf(self, namespace: str, dimensions: dict) -> dict:
+        """Return one embedded metric format record with a metric per stage and counter."""
+        with self.lock:
+            values = {"total_ms": round((time.perf_counter() - self.started_at) * 1000, 3)}
+            for stage, totals in self.stages.items():
+                for name, value in totals.items():
+                    values[f"{stage}_{name}"] = round(value, 3) if isinstance(value, float) else value
+        metrics = [
+            {"Name": name, "Unit": "Milliseconds" if name.endswith("_ms") else COUNTER_UNITS.get(name.rsplit("_", 1)[-1], "None")}
+            for name in values
+        ]
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {"Namespace": namespace, "Dimensions": [list(dimensions)], "Metrics": metrics}
+                ],
+            },
+            **dimensions,
+            **values,
+        }
+
+    def summary(self, width: int = 40) -> str:
+        """Return a text flame summary of the stages, widest first, for local runs."""
+        with self.lock:
+            total = (time.perf_counter() - self.started_at) * 1000
+            stages = sorted(self.stages.items(), key=lambda item: item[1].get("ms", 0), reverse=True)
+        lines = [f"{'total':<12} {total:9.1f} ms {'#' * width}"]
+        for stage, totals in stages:
+            ms = totals.get("ms", 0)
+            bar = "#" * max(1, round(width * ms / total)) if total else ""
+            extra = " ".join(f"{name}={value}" for name, value in totals.items() if name != "ms")
+            lines.append(f"{stage:<12} {ms:9.1f} ms {bar:<{width}} {extra}")
+        return "\n".join(lines)
+
+    def emit(self, namespace: str, dimensions: dict) -> None:
+        # Printed rather than logged so that the line is the bare JSON object EMF expects
+        print(json.dumps(self.emf(namespace, dimensions)))
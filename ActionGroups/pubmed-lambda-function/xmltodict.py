@@ -199,8 +199,86 @@ class _DictSAXHandler(object):
             return self.force_list(self.path[:-1], key, value)
 
 
+class _FastDictSAXHandler(object):
+    """Reduced handler used by ``parse(..., fast=True)``.
+
+    Builds the same plain-dict document as `_DictSAXHandler` with the
+    default options, but without namespace, postprocessor, force_list,
+    comment or streaming support. Tag and attribute names are interned so
+    repeated keys share one string, and attributes can be limited to
+    `attr_whitelist`.
+    """
+
+    def __init__(self,
+                 xml_attribs=True,
+                 attr_prefix='@',
+                 cdata_key='#text',
+                 strip_whitespace=True,
+                 attr_whitelist=None):
+        self.stack = []
+        self.data = []
+        self.item = None
+        self.names = {}
+        self.xml_attribs = xml_attribs
+        self.attr_prefix = attr_prefix
+        self.cdata_key = cdata_key
+        self.strip_whitespace = strip_whitespace
+        self.attr_whitelist = (None if attr_whitelist is None
+                               else frozenset(attr_whitelist))
+
+    def startElement(self, name, attrs):
+        self.stack.append((self.item, self.data))
+        item = None
+        if attrs and self.xml_attribs:
+            names = self.names
+            whitelist = self.attr_whitelist
+            item = {}
+            for i in range(0, len(attrs), 2):
+                key = attrs[i]
+                if whitelist is None or key in whitelist:
+                    key = self.attr_prefix + key
+                    item[names.setdefault(key, key)] = attrs[i + 1]
+            item = item or None
+        self.item = item
+        self.data = []
+
+    def endElement(self, name):
+        data = ''.join(self.data) if self.data else None
+        item = self.item
+        self.item, self.data = self.stack.pop()
+        if self.strip_whitespace and data:
+            data = data.strip() or None
+        if item is not None:
+            if data:
+                self.push_data(item, self.cdata_key, data)
+            data = item
+        name = self.names.setdefault(name, name)
+        if self.item is None:
+            self.item = {name: data}
+        else:
+            self.push_data(self.item, name, data)
+
+    def characters(self, data):
+        if not self.data:
+            self.data = [data]
+        else:
+            self.data.append(data)
+
+    @staticmethod
+    def push_data(item, key, data):
+        try:
+            value = item[key]
+            if isinstance(value, list):
+                value.append(data)
+            else:
+                item[key] = [value, data]
+        except KeyError:
+            item[key] = data
+
+
 def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
-          namespace_separator=':', disable_entities=True, process_comments=False, **kwargs):
+          namespace_separator=':', disable_entities=True, process_comments=False,
+          fast=False, **kwargs):
     """Parse the given XML input and convert it into a dictionary.
 
     `xml_input` can either be a `string`, a file-like object, or a generator of strings.
@@ -332,9 +410,26 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
                     'd': '2',
                 },
             }
+
+    If `fast` is `True`, a reduced handler builds the document: namespaces
+    and comments are not processed and only the `xml_attribs`,
+    `attr_prefix`, `cdata_key` and `strip_whitespace` options are
+    supported, plus `attr_whitelist`, an iterable of the attribute names to
+    keep (all by default). The result is the same as with the default
+    options. Use it for large documents such as batched PubMed efetch
+    responses::
+
+        >>> xmltodict.parse('<a x="1" y="2"><b>1</b></a>', fast=True,
+        ...                 attr_whitelist=('x',))
+        {'a': {'@x': '1', 'b': '1'}}
     """
-    handler = _DictSAXHandler(namespace_separator=namespace_separator,
-                              **kwargs)
+    if fast:
+        if process_namespaces or process_comments:
+            raise ValueError('fast mode does not process namespaces or comments')
+        handler = _FastDictSAXHandler(**kwargs)
+    else:
+        handler = _DictSAXHandler(namespace_separator=namespace_separator,
+                                  **kwargs)
     if isinstance(xml_input, _unicode):
         if not encoding:
             encoding = 'utf-8'
@@ -350,7 +445,8 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
     except AttributeError:
         # Jython's expat does not support ordered_attributes
         pass
-    parser.StartNamespaceDeclHandler = handler.startNamespaceDecl
+    if not fast:
+        parser.StartNamespaceDeclHandler = handler.startNamespaceDecl
     parser.StartElementHandler = handler.startElement
     parser.EndElementHandler = handler.endElement
     parser.CharacterDataHandler = handler.characters
@@ -0,0 +1,77 @@
+import json
+
+CLOSING_TAG = '</efficientQuery>'
+NO_CHANGE = 'no change needed'
+
+
+class EfficientQueryParser:
+    """
+    Incrementally extracts the answer of the SQL refinement prompt.
+
+    The assistant turn is prefilled with ``<efficientQuery>``, so the model
+    output starts inside the tag. Text is fed as it arrives and ``feed``
+    returns True as soon as the closing tag or the "no change needed"
+    sentinel has been seen, at which point ``result`` holds the extracted
+    single-line SQL or the sentinel. The tag may be split across chunks.
+    Responses cut by a ``</efficientQuery>`` stop sequence end without the
+    tag, and ``finish`` returns the text that was received.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.result = None
+
+    def feed(self, text):
+        if self.result is not None:
+            return True
+        start = max(len(self.text) - len(CLOSING_TAG), 0)
+        self.text += text
+        answer = self.text.lstrip()
+        if answer[:len(NO_CHANGE)].lower() == NO_CHANGE:
+            self.result = NO_CHANGE
+            return True
+        end = self.text.find(CLOSING_TAG, start)
+        if end != -1:
+            self.result = self.text[:end].strip()
+            return True
+        return False
+
+    def finish(self):
+        """Return the extracted answer, falling back to all text seen so far."""
+        if self.result is None:
+            self.result = self.text.strip()
+        return self.result
+
+
+def invoke_efficient_query(client, body, model_id):
+    """Call invoke_model and extract the refinement answer from the full response."""
+    response = client.invoke_model(body=body, modelId=model_id)
+    response_json = json.loads(response.get("body").read().decode('utf-8'))
+    parser = EfficientQueryParser()
+    for item in response_json.get('content', []):
+        if item.get('type') == 'text':
+            parser.feed(item.get('text'))
+    return parser.finish()
+
+
+def stream_efficient_query(client, body, model_id):
+    """
+    Call invoke_model_with_response_stream and stop reading the stream as
+    soon as the refinement answer is complete.
+    """
+    response = client.invoke_model_with_response_stream(body=body, modelId=model_id)
+    stream = response['body']
+    parser = EfficientQueryParser()
+    try:
+        for event in stream:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            delta = payload.get('delta', {})
+            if payload.get('type') == 'content_block_delta' and delta.get('type') == 'text_delta':
+                if parser.feed(delta['text']):
+                    break
+    finally:
+        stream.close()
+    return parser.finish()
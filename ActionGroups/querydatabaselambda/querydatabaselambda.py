@@ -1,16 +1,32 @@
-import boto3
-import time
 import os
 import uuid
 import json
-import sys
+import ast
 from collections import defaultdict
+from aws_clients import get_client, get_resource
+from redshift_data import StatementWaiter, StatementError, ColumnarResult, read_columnar_result
+from schema_catalog import SchemaCatalog, FileSchemaStore, S3SchemaStore
+from result_spill import build_npz_spill
+from result_cache import ResultCache, FileResultStore, S3ResultStore
+from sql_validation import validate_query, cap_unaggregated_query
+from efficient_query import invoke_efficient_query, stream_efficient_query, CLOSING_TAG
 
-redshift_client = boto3.client('redshift-data')
+redshift_client = get_client('redshift-data')
+statement_waiter = StatementWaiter(redshift_client)
+MAX_RESULT_ROWS = int(os.environ.get('MAX_RESULT_ROWS', '100000'))
+SPILL_FORMAT = os.environ.get('SPILL_FORMAT', 'npz')
+MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', '10'))
+REFINE_STREAMING = os.environ.get('REFINE_STREAMING', 'true').lower() == 'true'
+SQL_VALIDATION = os.environ.get('SQL_VALIDATION', 'true').lower() == 'true'
+# Tables that can be queried but are not covered by the cached schema
+UNCACHED_TABLES = [table for table in os.environ.get('UNCACHED_TABLES', 'chemotherapy_survival').split(',') if table]
+# Seconds the result cache waits for the table version before bypassing the cache
+VERSION_TIMEOUT = float(os.environ.get('RESULT_CACHE_VERSION_TIMEOUT', '10'))
+# Bedrock Agents limit the size of the action group response body
+MAX_INLINE_BYTES = 20000
 
 def refineSQL(sql, question):
-    raw_schema = get_schema()
-    schema = extract_table_columns(raw_schema)
+    schema = schema_catalog.get()
     
     prompt = f"""
     You are an extremely critical SQL query evaluation assistant. Your job is to analyze
@@ -70,7 +86,7 @@ def refineSQL(sql, question):
     
     Remember to prioritize aggregation when possible to reduce SQL output size and provide more meaningful results.
     """
-    client = boto3.client('bedrock-runtime')
+    client = get_client('bedrock-runtime', read_timeout=300)
     user_message = {"role": "user", "content": prompt}
     claude_response = {"role": "assistant", "content": "<efficientQuery>"}
     model_Id = 'anthropic.claude-3-5-sonnet-20240620-v1:0'
@@ -78,25 +94,33 @@ def refineSQL(sql, question):
     system_prompt = "You are an extremely critical sql query evaluation assistant, your job is to look at the schema, sql query and question being asked to then evaluate the query to ensure it is efficient."
     max_tokens = 1000
     
-    body = json.dumps({
+    request = {
         "messages": messages,
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": max_tokens,
         "system": system_prompt
-    })
-    
-    response = client.invoke_model(body=body, modelId=model_Id)
-    response_bytes = response.get("body").read()
-    response_text = response_bytes.decode('utf-8')
-    response_json = json.loads(response_text)
-    content = response_json.get('content', [])
-    for item in content:
-        if item.get('type') == 'text':
-            result_text = item.get('text')
-            print(result_text)
-            return result_text
+    }
     
-    return "No SQL found in response"
+    if REFINE_STREAMING:
+        # The parser closes the stream once it sees the closing tag
+        result_text = stream_efficient_query(client, json.dumps(request), model_Id)
+    else:
+        request["stop_sequences"] = [CLOSING_TAG]
+        result_text = invoke_efficient_query(client, json.dumps(request), model_Id)
+    print(result_text)
+    return result_text if result_text else "No SQL found in response"
+
+def submit_statement(sql):
+    """Submit a SQL statement to the cluster without waiting for it."""
+    result = redshift_client.execute_statement(Database='dev', DbUser='admin', Sql=sql, ClusterIdentifier='biomarker-redshift-cluster')
+    print("SQL statement execution started. StatementId:", result['Id'])
+    return result['Id']
+
+def execute_statement(sql, timeout=None):
+    """Submit a SQL statement to the cluster and wait until it has finished."""
+    statement_id = submit_statement(sql)
+    statement_waiter.wait(statement_id, timeout)
+    return statement_id
 
 def get_schema():
     sql = """
@@ -113,56 +137,121 @@ def get_schema():
             AND NOT a.attisdropped;"""
     
     try:
-        result = redshift_client.execute_statement(Database='dev', DbUser='admin', Sql=sql, ClusterIdentifier='biomarker-redshift-cluster')
-        print("SQL statement execution started. StatementId:", result['Id'])
-    
-        def wait_for_query_completion(statement_id):
-            while True:
-                response = redshift_client.describe_statement(Id=statement_id)
-                status = response['Status']
-                if status == 'FINISHED':
-                    print("SQL statement execution completed.")
-                    break
-                elif status in ['FAILED', 'CANCELLED']:
-                    print("SQL statement execution failed or was cancelled.")
-                    break
-                print("Waiting for SQL statement execution to complete...")
-                time.sleep(5)
-        
-        wait_for_query_completion(result['Id'])
-        
-        response = redshift_client.get_statement_result(Id=result['Id'])
+        statement_id = execute_statement(sql)
+        response = redshift_client.get_statement_result(Id=statement_id)
         return response
     except Exception as e:
         print("Error:", e)
         raise
 
+def get_schema_version():
+    """Cheap fingerprint of the clinical_genomic columns used to detect schema changes."""
+    sql = """
+        SELECT
+            COUNT(*) AS column_count,
+            SUM(a.attnum * 31 + a.atttypid) AS type_checksum,
+            SUM(a.atttypmod) AS typmod_checksum
+        FROM
+            pg_catalog.pg_attribute a
+        WHERE
+            a.attrelid = 'clinical_genomic'::regclass
+            AND a.attnum > 0
+            AND NOT a.attisdropped;"""
+
+    statement_id = execute_statement(sql)
+    response = redshift_client.get_statement_result(Id=statement_id)
+    record = response['Records'][0]
+    return ':'.join(str(next(iter(value.values()))) for value in record)
+
+def get_table_version():
+    """Token that changes whenever clinical_genomic is recreated or its data is reloaded."""
+    sql = """
+        SELECT table_id, tbl_rows, size
+        FROM svv_table_info
+        WHERE "table" = 'clinical_genomic';"""
+
+    statement_id = execute_statement(sql, timeout=VERSION_TIMEOUT)
+    response = redshift_client.get_statement_result(Id=statement_id)
+    if not response['Records']:
+        return 'empty'
+    return ':'.join(str(next(iter(value.values()))) for value in response['Records'][0])
+
+def prepare_query(query):
+    """Validate a query against the cached schema and cap unaggregated selects."""
+    if not SQL_VALIDATION:
+        return query
+    estimate = validate_query(query, schema_catalog.get(), other_tables=UNCACHED_TABLES)
+    print("Query estimate:", estimate)
+    # One row over the budget lets the result reader report truncation
+    return cap_unaggregated_query(query, estimate, MAX_RESULT_ROWS + 1)
+
 def query_redshift(query):
     try:
-        result = redshift_client.execute_statement(Database='dev', DbUser='admin', Sql=query, ClusterIdentifier='biomarker-redshift-cluster')
-        print("SQL statement execution started. StatementId:", result['Id'])
-    
-        def wait_for_query_completion(statement_id):
-            while True:
-                response = redshift_client.describe_statement(Id=statement_id)
-                status = response['Status']
-                if status == 'FINISHED':
-                    print("SQL statement execution completed.")
-                    break
-                elif status in ['FAILED', 'CANCELLED']:
-                    print("SQL statement execution failed or was cancelled.")
-                    break
-                print("Waiting for SQL statement execution to complete...")
-                time.sleep(5)
-        
-        wait_for_query_completion(result['Id'])
-        
-        response = redshift_client.get_statement_result(Id=result['Id'])
-        return response
+        query = prepare_query(query)
+        result = result_cache.get(query)
+        if result is not None:
+            return result
+        statement_id = execute_statement(query)
+        result = read_columnar_result(redshift_client, statement_id, max_rows=MAX_RESULT_ROWS)
+        result_cache.put(query, result)
+        return result
     except Exception as e:
         print("Error:", e)
         raise
 
+def query_redshift_batch(queries):
+    """
+    Run independent queries concurrently and return one entry per query,
+    holding either its result or the error that stopped it.
+    """
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"At most {MAX_BATCH_QUERIES} queries can be sent in one batch")
+
+    prepared = {}
+    submitted = {}
+    cached = {}
+    errors = {}
+    for i, query in enumerate(queries):
+        try:
+            prepared[i] = prepare_query(query)
+            result = result_cache.get(prepared[i])
+            if result is not None:
+                cached[i] = result
+            else:
+                submitted[i] = submit_statement(prepared[i])
+        except Exception as e:
+            errors[i] = str(e)
+
+    outcomes = statement_waiter.wait_all(list(submitted.values()))
+    results = []
+    for i, query in enumerate(queries):
+        entry = {'query': query}
+        if i in errors:
+            entry['error'] = errors[i]
+        elif i in cached:
+            entry['result'] = cached[i]
+        elif isinstance(outcomes[submitted[i]], StatementError):
+            entry['error'] = str(outcomes[submitted[i]])
+        else:
+            try:
+                result = read_columnar_result(redshift_client, submitted[i], max_rows=MAX_RESULT_ROWS)
+                result_cache.put(prepared[i], result)
+                entry['result'] = result
+            except Exception as e:
+                entry['error'] = str(e)
+        results.append(entry)
+    return results
+
+def parse_queries(value):
+    """Parse the queries parameter, sent by the agent as a JSON or Python list literal."""
+    try:
+        queries = json.loads(value)
+    except json.JSONDecodeError:
+        queries = ast.literal_eval(value)
+    if isinstance(queries, str):
+        queries = [queries]
+    return list(queries)
+
 def extract_table_columns(query):
     table_columns = defaultdict(list)
     for record in query["Records"]:
@@ -178,20 +267,107 @@ def extract_table_columns(query):
         table_columns[table_name].append(column_details)
     return dict(table_columns)
 
-def upload_result_s3(result, bucket, key):
-    s3 = boto3.resource('s3')
+def schema_store_from_env():
+    uri = os.environ.get('SCHEMA_CACHE_URI', '/tmp/schema_catalog.json')
+    if not uri:
+        return None
+    if uri.startswith('s3://'):
+        bucket, _, key = uri[len('s3://'):].partition('/')
+        return S3SchemaStore(get_client('s3'), bucket, key)
+    return FileSchemaStore(uri)
+
+schema_catalog = SchemaCatalog(
+    fetch_schema=lambda: extract_table_columns(get_schema()),
+    fetch_version=get_schema_version,
+    ttl=int(os.environ.get('SCHEMA_CACHE_TTL', '900')),
+    store=schema_store_from_env()
+)
+
+def result_store_from_env():
+    uri = os.environ.get('RESULT_CACHE_URI')
+    if not uri:
+        return None
+    if uri.startswith('s3://'):
+        bucket, _, prefix = uri[len('s3://'):].partition('/')
+        return S3ResultStore(get_client('s3'), bucket, prefix)
+    return FileResultStore(uri)
+
+result_cache = ResultCache(
+    fetch_version=get_table_version,
+    max_entries=int(os.environ.get('RESULT_CACHE_SIZE', '64')),
+    ttl=int(os.environ.get('RESULT_CACHE_TTL', '3600')),
+    store=result_store_from_env()
+)
+
+def iter_result_chunks(result, top_level=True):
+    """Yield the text body returned to the agent in pieces."""
+    if isinstance(result, ColumnarResult):
+        yield from result.iter_json_chunks()
+    elif isinstance(result, str) and top_level:
+        yield result
+    elif isinstance(result, list):
+        yield '['
+        for i, item in enumerate(result):
+            if i:
+                yield ', '
+            yield from iter_result_chunks(item, top_level=False)
+        yield ']'
+    elif isinstance(result, dict):
+        yield '{'
+        for i, (key, value) in enumerate(result.items()):
+            yield (', ' if i else '') + json.dumps(key) + ': '
+            yield from iter_result_chunks(value, top_level=False)
+        yield '}'
+    else:
+        yield json.dumps(result)
+
+def serialize_result(result, limit):
+    """
+    Serialize a result into UTF-8 chunks, stopping once more than limit bytes
+    have been produced. Returns the encoded chunks, their total size and the
+    iterator over the chunks that have not been serialized yet, so callers
+    can finish the serialization without starting over.
+    """
+    chunks = []
+    size = 0
+    remaining = iter_result_chunks(result)
+    for chunk in remaining:
+        data = chunk.encode('utf-8')
+        chunks.append(data)
+        size += len(data)
+        if size > limit:
+            break
+    return chunks, size, remaining
+
+def upload_result_s3(data, bucket, key):
+    s3 = get_resource('s3')
     s3object = s3.Object(bucket, key)
-    s3object.put(Body=(bytes(json.dumps(result).encode('UTF-8'))))
+    s3object.put(Body=data)
     return s3object
 
+def upload_result_npz(result, bucket, key):
+    """Write the columns as a .npz object next to a JSON manifest stored under key."""
+    data_key = os.path.splitext(key)[0] + '.npz'
+    data, manifest = build_npz_spill(result, data_key)
+    s3 = get_resource('s3')
+    s3.Object(bucket, data_key).put(Body=data)
+    print(f"Spilled {manifest['row_count']} rows as {manifest['byte_size']} bytes to {data_key}")
+    return upload_result_s3(json.dumps(manifest).encode('utf-8'), bucket, key)
+
 def lambda_handler(event, context):
+    # Direct invocation hook for data reloads: {"invalidateCache": true}
+    if event.get('invalidateCache'):
+        schema_catalog.invalidate()
+        result_cache.invalidate()
+        print("Schema and result caches invalidated")
+        return {'invalidated': True, 'resultCacheStats': result_cache.stats}
+
     result = None
     error_message = None
 
     try:
         if event['apiPath'] == "/getschema":
-            raw_schema = get_schema()
-            result = extract_table_columns(raw_schema)
+            result = schema_catalog.get()
 
         elif event['apiPath'] == "/refinesql":
             params =event['parameters']
@@ -214,11 +390,17 @@ def lambda_handler(event, context):
                 
             result = query_redshift(query)
 
+        elif event['apiPath'] == "/queryredshift/batch":
+            params =event['parameters']
+            for param in params:
+                if param.get("name") == "queries":
+                    queries = parse_queries(param.get("value"))
+                    print(queries)
+
+            result = query_redshift_batch(queries)
+
         else:
             raise ValueError(f"Unknown apiPath: {event['apiPath']}")
-
-        if result:
-            print("Query Result:", result)
     
     except Exception as e:
         error_message = str(e)
@@ -226,21 +408,28 @@ def lambda_handler(event, context):
 
     BUCKET_NAME = os.environ['BUCKET_NAME']
     KEY = str(uuid.uuid4()) + '.json'
-    size = sys.getsizeof(str(result)) if result else 0
-    print(f"Response size: {size} bytes")
+    chunks, size, remaining = serialize_result(result, MAX_INLINE_BYTES) if result else ([], 0, None)
+    print(f"Response size: {size}{'+' if size > MAX_INLINE_BYTES else ''} bytes")
     
-    if size > 20000:
+    if size > MAX_INLINE_BYTES:
         print('Size greater than 20KB, writing to a file in S3')
-        result = upload_result_s3(result, BUCKET_NAME, KEY)
+        if isinstance(result, ColumnarResult) and SPILL_FORMAT == 'npz':
+            result = upload_result_npz(result, BUCKET_NAME, KEY)
+        else:
+            chunks.extend(chunk.encode('utf-8') for chunk in remaining)
+            result = upload_result_s3(b''.join(chunks), BUCKET_NAME, KEY)
         response_body = {
             'application/json': {
                 'body': f"Result uploaded to S3. Bucket: {BUCKET_NAME}, Key: {KEY}"
             }
         }
     else:
+        body = b''.join(chunks).decode('utf-8')
+        if result:
+            print("Query Result:", body)
         response_body = {
             'application/json': {
-                'body': str(result) if result else error_message
+                'body': body if result else error_message
             }
         }
 
@@ -0,0 +1,213 @@
+import json
+import math
+import time
+from array import array
+
+
+class StatementError(Exception):
+    """Raised when a Redshift Data API statement fails, is aborted or times out."""
+
+    def __init__(self, statement_id, status, error=None):
+        self.statement_id = statement_id
+        self.status = status
+        self.error = error
+        message = f"SQL statement {statement_id} {status.lower()}"
+        if error:
+            message += f": {error}"
+        super().__init__(message)
+
+
+class StatementWaiter:
+    """
+    Waits for Redshift Data API statements to reach a terminal state.
+
+    The first status check happens after ``initial_delay`` seconds and the
+    delay between checks then grows geometrically by ``multiplier`` up to
+    ``max_delay``, so short aggregations return in tens of milliseconds
+    while long-running statements are not polled aggressively. A statement
+    that has not finished within ``timeout`` seconds is cancelled.
+    """
+    FINISHED = 'FINISHED'
+    FAILED_STATUSES = ('FAILED', 'ABORTED', 'CANCELLED')
+
+    def __init__(self, client, initial_delay=0.05, max_delay=2.0, multiplier=1.5, timeout=300.0):
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.timeout = timeout
+
+    def wait(self, statement_id, timeout=None):
+        """
+        Block until the statement finishes and return its description.
+
+        Raises:
+            StatementError: if the statement fails, is aborted, or does not
+                finish before the deadline.
+        """
+        outcome = self.wait_all([statement_id], timeout)[statement_id]
+        if isinstance(outcome, StatementError):
+            raise outcome
+        return outcome
+
+    def wait_all(self, statement_ids, timeout=None):
+        """
+        Wait for several statements on one shared backoff schedule.
+
+        Returns a dict mapping each statement id to its description once
+        finished, or to a StatementError if it failed, was aborted or did not
+        finish before the deadline.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        delay = self.initial_delay
+        pending = list(statement_ids)
+        outcomes = {}
+        while pending:
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            for statement_id in list(pending):
+                response = self.client.describe_statement(Id=statement_id)
+                status = response['Status']
+                if status == self.FINISHED:
+                    print(f"SQL statement {statement_id} execution completed.")
+                    outcomes[statement_id] = response
+                elif status in self.FAILED_STATUSES:
+                    outcomes[statement_id] = StatementError(statement_id, status, response.get('Error'))
+                else:
+                    continue
+                pending.remove(statement_id)
+            if pending and time.monotonic() >= deadline:
+                for statement_id in pending:
+                    self.cancel(statement_id)
+                    outcomes[statement_id] = StatementError(statement_id, 'TIMED OUT')
+                break
+            delay = min(delay * self.multiplier, self.max_delay)
+        return outcomes
+
+    def cancel(self, statement_id):
+        try:
+            self.client.cancel_statement(Id=statement_id)
+        except Exception as e:
+            print(f"Could not cancel statement {statement_id}: {e}")
+
+
+def iter_result_pages(client, statement_id):
+    """Lazily yield get_statement_result pages, following NextToken."""
+    kwargs = {'Id': statement_id}
+    while True:
+        page = client.get_statement_result(**kwargs)
+        yield page
+        next_token = page.get('NextToken')
+        if not next_token:
+            return
+        kwargs['NextToken'] = next_token
+
+
+class Column:
+    """Typed buffer for one result column, decoded from Data API cells."""
+    LONG_TYPES = ('int2', 'int4', 'int8', 'smallint', 'integer', 'bigint')
+    DOUBLE_TYPES = ('float4', 'float8', 'float', 'real', 'double precision', 'numeric', 'decimal')
+    BOOLEAN_TYPES = ('bool', 'boolean')
+
+    def __init__(self, name, type_name):
+        self.name = name
+        self.type_name = type_name
+        if type_name in self.LONG_TYPES:
+            self.kind = 'long'
+            self.values = array('q')
+        elif type_name in self.DOUBLE_TYPES:
+            self.kind = 'double'
+            self.values = array('d')
+        elif type_name in self.BOOLEAN_TYPES:
+            self.kind = 'boolean'
+            self.values = array('b')
+        else:
+            self.kind = 'string'
+            self.values = []
+        self.nulls = bytearray()
+
+    def append(self, cell):
+        self.append_value(None if cell.get('isNull') else next(iter(cell.values())))
+
+    def append_value(self, value):
+        if value is None:
+            self.nulls.append(1)
+            self.values.append(math.nan if self.kind == 'double' else (None if self.kind == 'string' else 0))
+            return
+        self.nulls.append(0)
+        if self.kind == 'double' and isinstance(value, str):
+            value = float(value)
+        elif self.kind == 'string' and not isinstance(value, str):
+            value = str(value)
+        self.values.append(value)
+
+    def has_nulls(self):
+        return any(self.nulls)
+
+    def __getitem__(self, i):
+        if self.nulls[i]:
+            return None
+        value = self.values[i]
+        return bool(value) if self.kind == 'boolean' else value
+
+
+class ColumnarResult:
+    """
+    A statement result decoded into typed column buffers.
+
+    Numeric and boolean columns are stored in ``array.array`` buffers, which
+    NumPy and pandas can wrap without copying; string columns are lists.
+    ``truncated`` is set when the row budget stopped the read early.
+    """
+
+    def __init__(self, columns, row_count=0, truncated=False):
+        self.columns = columns
+        self.row_count = row_count
+        self.truncated = truncated
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def rows(self):
+        for i in range(self.row_count):
+            yield [column[i] for column in self.columns]
+
+    @classmethod
+    def from_rows(cls, column_names, type_names, rows, truncated=False):
+        columns = [Column(name, type_name) for name, type_name in zip(column_names, type_names)]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append_value(value)
+        return cls(columns, row_count=len(rows), truncated=truncated)
+
+    def iter_json_chunks(self):
+        """
+        Yield the result as JSON text one row at a time, in the form
+        {"columns": [...], "rows": [[...], ...], "row_count": n, "truncated": b}.
+        """
+        yield '{"columns": %s, "rows": [' % json.dumps(self.column_names)
+        for i, row in enumerate(self.rows()):
+            yield (', ' if i else '') + json.dumps(row)
+        yield '], "row_count": %d, "truncated": %s}' % (self.row_count, json.dumps(self.truncated))
+
+
+def read_columnar_result(client, statement_id, max_rows=None):
+    """
+    Page through a statement result and decode it into a ColumnarResult.
+
+    Reading stops once ``max_rows`` rows have been decoded so that memory
+    stays bounded regardless of the size of the result set.
+    """
+    result = None
+    for page in iter_result_pages(client, statement_id):
+        if result is None:
+            result = ColumnarResult([Column(meta['name'], meta.get('typeName', '')) for meta in page['ColumnMetadata']])
+        columns = result.columns
+        for record in page['Records']:
+            if max_rows is not None and result.row_count >= max_rows:
+                result.truncated = True
+                return result
+            for column, cell in zip(columns, record):
+                column.append(cell)
+            result.row_count += 1
+    return result
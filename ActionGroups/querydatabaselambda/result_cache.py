@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from redshift_data import ColumnarResult
+
+STRING_LITERAL = r"'(?:[^']|'')*'"
+LITERAL = STRING_LITERAL + r"|-?\d+(?:\.\d+)?"
+IN_LIST = re.compile(r"\bin\(((?:%s)(?:,(?:%s))*)\)" % (LITERAL, LITERAL))
+TABLE_PREFIX = re.compile(r'(?<![\w"])(?:"?dev"?\.)?"?public"?\.')
+
+
+def normalize_sql(sql):
+    """
+    Normalize SQL text for use as a cache key.
+
+    Keywords and identifiers are lowercased and whitespace is collapsed
+    outside of string literals, ``dev.public.`` prefixes are dropped, a
+    trailing semicolon is removed and the literals of ``IN (...)`` lists
+    are sorted, so that trivially different spellings of the same query
+    share one entry.
+    """
+    parts = re.split('(%s)' % STRING_LITERAL, sql.strip().rstrip(';').strip())
+    for i in range(0, len(parts), 2):
+        text = re.sub(r'\s+', ' ', parts[i].lower())
+        text = re.sub(r' ?([(),=<>]) ?', r'\1', text)
+        parts[i] = TABLE_PREFIX.sub('', text)
+    normalized = ''.join(parts).strip()
+    return IN_LIST.sub(lambda m: 'in(%s)' % ','.join(sorted(re.findall(LITERAL, m.group(1)))), normalized)
+
+
+def encode_result(result):
+    types = json.dumps([column.type_name for column in result.columns])
+    return ('{"types": %s, "result": %s}' % (types, ''.join(result.iter_json_chunks()))).encode('utf-8')
+
+
+def decode_result(data):
+    payload = json.loads(data.decode('utf-8'))
+    result = payload['result']
+    return ColumnarResult.from_rows(result['columns'], payload['types'], result['rows'], result['truncated'])
+
+
+class FileResultStore:
+    """Second cache tier keeping one file per entry in a local directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.directory, key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        with open(os.path.join(self.directory, key), 'wb') as f:
+            f.write(data)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+
+class S3ResultStore:
+    """Second cache tier keeping one object per entry under an S3 prefix."""
+
+    def __init__(self, s3_client, bucket, prefix):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+
+    def get(self, key):
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+            return obj['Body'].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def put(self, key, data):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def clear(self):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                self.s3_client.delete_object(Bucket=self.bucket, Key=obj['Key'])
+
+
+class ResultCache:
+    """
+    Two-tier cache of query results keyed on normalized SQL and a table version.
+
+    The first tier is an in-process LRU of at most ``max_entries`` results;
+    the optional second tier is a FileResultStore or S3ResultStore shared
+    across containers. ``fetch_version`` returns a token that changes when
+    the underlying data is reloaded; it is re-checked every ``version_ttl``
+    seconds and is part of every key, so entries for old data are never
+    served. Results larger than ``max_rows`` rows are not cached. When the
+    version cannot be fetched the cache is bypassed: lookups miss and
+    results are not stored, so the query itself still runs.
+    """
+
+    def __init__(self, fetch_version, max_entries=64, max_rows=10000, ttl=3600, version_ttl=300, store=None):
+        self.fetch_version = fetch_version
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.store = store
+        self._entries = OrderedDict()
+        self._version = None
+        self._version_checked_at = 0
+        self.stats = {'hits': 0, 'store_hits': 0, 'misses': 0, 'invalidations': 0, 'version_errors': 0}
+
+    def key(self, sql):
+        return hashlib.sha256(f"{self.version()}\n{normalize_sql(sql)}".encode('utf-8')).hexdigest()
+
+    def version(self):
+        if self._version is None or time.time() - self._version_checked_at >= self.version_ttl:
+            version = self.fetch_version()
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._version_checked_at = time.time()
+        return self._version
+
+    def get(self, sql):
+        key = self._key_or_none(sql)
+        if key is None:
+            self.stats['misses'] += 1
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self._log('hit', key)
+            return entry[1]
+
+        data = self._store_get(key)
+        if data is not None:
+            stored_at, _, data = data.partition(b'\n')
+            if time.time() - float(stored_at) < self.ttl:
+                result = decode_result(data)
+                self._remember(key, float(stored_at), result)
+                self.stats['store_hits'] += 1
+                self._log('store hit', key)
+                return result
+
+        self.stats['misses'] += 1
+        self._log('miss', key)
+        return None
+
+    def put(self, sql, result):
+        if result.row_count > self.max_rows:
+            return
+        key = self._key_or_none(sql)
+        if key is None:
+            return
+        stored_at = time.time()
+        self._remember(key, stored_at, result)
+        if self.store is not None:
+            try:
+                self.store.put(key, b'%f\n' % stored_at + encode_result(result))
+            except Exception as e:
+                print(f"Could not write result cache entry {key}: {e}")
+
+    def invalidate(self):
+        """Drop every cached result, e.g. after the clinical data has been reloaded."""
+        self._entries.clear()
+        self._version = None
+        self.stats['invalidations'] += 1
+        if self.store is not None:
+            self.store.clear()
+
+    def _key_or_none(self, sql):
+        try:
+            return self.key(sql)
+        except Exception as e:
+            # Retried on the next lookup, as _version_checked_at is not updated
+            self.stats['version_errors'] += 1
+            print(f"Could not fetch the table version, bypassing the result cache: {e}")
+            return None
+
+    def _remember(self, key, stored_at, result):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _store_get(self, key):
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except Exception as e:
+            print(f"Could not read result cache entry {key}: {e}")
+            return None
+
+    def _log(self, status, key):
+        print(f"Result cache {status} for {key[:12]}: " + json.dumps(self.stats))
@@ -0,0 +1,69 @@
+import io
+import sys
+import zipfile
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+DTYPES = {
+    'long': BYTE_ORDER + 'i8',
+    'double': BYTE_ORDER + 'f8',
+    'boolean': '|b1'
+}
+
+
+def encode_npy(descr, length, data):
+    """Encode a 1-d buffer as a .npy (format 1.0) file readable by numpy.load."""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, length)
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return NPY_MAGIC + len(header).to_bytes(2, 'little') + header + data
+
+
+def encode_column(column):
+    """Return the .npy encoding of a Column; null strings are stored as empty strings."""
+    if column.kind in DTYPES:
+        return DTYPES[column.kind], encode_npy(DTYPES[column.kind], len(column.values), column.values.tobytes())
+    values = ['' if value is None else value for value in column.values]
+    width = max((len(value) for value in values), default=0) or 1
+    descr = BYTE_ORDER + 'U%d' % width
+    encoding = 'utf-32-le' if BYTE_ORDER == '<' else 'utf-32-be'
+    data = ''.join(value.ljust(width, '\0') for value in values).encode(encoding)
+    return descr, encode_npy(descr, len(values), data)
+
+
+def build_npz_spill(result, data_key):
+    """
+    Serialize a ColumnarResult as a compressed .npz archive.
+
+    Each column is stored as ``c<i>.npy`` and, when it contains nulls, a
+    boolean mask as ``c<i>_null.npy``. Returns the archive bytes together
+    with a JSON-serializable manifest describing the schema, row count and
+    byte size so that readers can load the columns without a per-cell walk.
+    """
+    buffer = io.BytesIO()
+    columns = []
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as npz:
+        for i, column in enumerate(result.columns):
+            entry = f"c{i}"
+            descr, data = encode_column(column)
+            npz.writestr(entry + '.npy', data)
+            has_nulls = column.has_nulls()
+            if has_nulls:
+                npz.writestr(entry + '_null.npy', encode_npy('|b1', len(column.nulls), bytes(column.nulls)))
+            columns.append({
+                'name': column.name,
+                'type': column.kind,
+                'entry': entry,
+                'dtype': descr,
+                'nulls': has_nulls
+            })
+    data = buffer.getvalue()
+    manifest = {
+        'format': 'npz',
+        'data_key': data_key,
+        'columns': columns,
+        'row_count': result.row_count,
+        'truncated': result.truncated,
+        'byte_size': len(data)
+    }
+    return data, manifest
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+
+class FileSchemaStore:
+    """Persists the schema catalog entry as a JSON file, e.g. under /tmp."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, entry):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class S3SchemaStore:
+    """Persists the schema catalog entry as a JSON object in S3."""
+
+    def __init__(self, s3_client, bucket, key):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def load(self):
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+            return json.loads(obj['Body'].read().decode('utf-8'))
+        except Exception as e:
+            print(f"Schema cache not loaded from s3://{self.bucket}/{self.key}: {e}")
+            return None
+
+    def save(self, entry):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=json.dumps(entry).encode('utf-8'))
+
+    def delete(self):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.key)
+
+
+class SchemaCatalog:
+    """
+    Warm-container cache of the table schema with an optional persisted copy.
+
+    The schema is served from memory while it is younger than ``ttl`` seconds.
+    Once the TTL expires, ``fetch_version`` is called to compute a cheap
+    fingerprint of the catalog; the full schema is only fetched again with
+    ``fetch_schema`` when that fingerprint has changed.
+    """
+
+    def __init__(self, fetch_schema, fetch_version, ttl=900, store=None):
+        self.fetch_schema = fetch_schema
+        self.fetch_version = fetch_version
+        self.ttl = ttl
+        self.store = store
+        self._entry = None
+
+    def get(self):
+        entry = self._entry
+        if entry is None and self.store is not None:
+            entry = self.store.load()
+        if entry is not None and time.time() - entry['checked_at'] < self.ttl:
+            self._entry = entry
+            return entry['schema']
+
+        version = self.fetch_version()
+        if entry is not None and entry['version'] == version:
+            print("Schema version unchanged, extending cached schema")
+        else:
+            print("Schema version changed, reloading schema")
+            entry = {'version': version, 'schema': self.fetch_schema()}
+        entry['checked_at'] = time.time()
+        self._entry = entry
+        self._persist(entry)
+        return entry['schema']
+
+    def invalidate(self):
+        """Drop the cached schema, e.g. after the table has been reloaded."""
+        self._entry = None
+        if self.store is not None:
+            self.store.delete()
+
+    def _persist(self, entry):
+        if self.store is None:
+            return
+        try:
+            self.store.save(entry)
+        except Exception as e:
+            print(f"Could not persist schema cache: {e}")
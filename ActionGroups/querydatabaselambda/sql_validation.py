@@ -0,0 +1,244 @@
+import difflib
+import re
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d+)?(?:e[+-]?\d+)?)
+  | (?P<word>[a-z_][a-z0-9_$]*)
+  | (?P<cast>::)
+  | (?P<symbol>[(),.;*])
+  | (?P<operator>[<>=!|+\-/%~^&@#?:\[\]{}]+)
+  | (?P<other>.)
+""", re.IGNORECASE | re.VERBOSE | re.DOTALL)
+
+KEYWORDS = {
+    'select', 'distinct', 'all', 'from', 'where', 'group', 'by', 'having', 'order', 'asc', 'desc',
+    'limit', 'offset', 'top', 'as', 'on', 'using', 'join', 'inner', 'left', 'right', 'full', 'outer',
+    'cross', 'natural', 'union', 'intersect', 'except', 'minus', 'with', 'and', 'or', 'not', 'in',
+    'is', 'null', 'true', 'false', 'like', 'ilike', 'similar', 'to', 'between', 'exists', 'any',
+    'some', 'case', 'when', 'then', 'else', 'end', 'cast', 'nulls', 'first', 'last', 'over',
+    'partition', 'rows', 'range', 'unbounded', 'preceding', 'following', 'current', 'row',
+    'interval', 'date', 'timestamp', 'time', 'year', 'month', 'day', 'hour', 'minute', 'second',
+    'escape', 'within', 'filter', 'lateral', 'values', 'int', 'integer', 'bigint', 'smallint',
+    'float', 'real', 'double', 'precision', 'numeric', 'decimal', 'varchar', 'char', 'text',
+    'boolean', 'bool', 'both', 'leading', 'trailing', 'for', 'fetch', 'next', 'only',
+    'current_date', 'current_time', 'current_timestamp', 'current_user', 'sysdate', 'localtimestamp',
+}
+AGGREGATES = {
+    'count', 'sum', 'avg', 'min', 'max', 'stddev', 'stddev_samp', 'stddev_pop', 'variance',
+    'var_samp', 'var_pop', 'median', 'percentile_cont', 'percentile_disc', 'listagg',
+    'approximate', 'bool_and', 'bool_or', 'corr', 'covar_samp', 'covar_pop',
+}
+# Functions whose first argument is a bare date part, e.g. datediff(week, a, b)
+DATE_PART_FUNCTIONS = {'datediff', 'dateadd', 'date_part', 'date_trunc', 'extract'}
+# Keywords that start a clause of the (sub)query they appear in
+CLAUSES = {
+    'with': 'with', 'select': 'select', 'from': 'from', 'where': 'where', 'group': 'group',
+    'having': 'having', 'order': 'order', 'limit': 'limit', 'offset': 'limit', 'on': 'on',
+    'using': 'on', 'union': None, 'intersect': None, 'except': None, 'minus': None,
+}
+JOIN_WORDS = {'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural', 'lateral'}
+
+
+class SQLValidationError(ValueError):
+    """Raised when a query references tables or columns that are not in the schema."""
+
+
+class Token:
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+        self.value = text.lower() if kind == 'word' else (text[1:-1].replace('""', '"').lower() if kind == 'quoted' else text)
+
+    @property
+    def is_name(self):
+        return self.kind == 'quoted' or (self.kind == 'word' and self.value not in KEYWORDS)
+
+
+def tokenize(sql):
+    return [Token(match.lastgroup, match.group()) for match in TOKEN.finditer(sql) if match.lastgroup != 'space']
+
+
+class QueryAnalysis:
+    """Tables, column references and cost indicators found in a SELECT statement."""
+
+    def __init__(self):
+        self.kind = None
+        self.tables = set()
+        self.ctes = set()
+        self.aliases = set()
+        self.columns = []
+        self.projected_columns = 0
+        self.select_star = False
+        self.has_aggregation = False
+        self.has_group_by = False
+        self.has_where = False
+        self.has_limit = False
+        self.limit = None
+
+    def estimate(self, column_count):
+        projected = column_count if self.select_star else self.projected_columns
+        if self.has_aggregation and not self.has_group_by:
+            shape = 'single_row'
+        elif self.has_aggregation or self.has_group_by:
+            shape = 'grouped'
+        elif self.has_limit:
+            shape = 'limited'
+        elif self.has_where:
+            shape = 'filtered_scan'
+        else:
+            shape = 'full_scan'
+        return {
+            'projected_columns': projected,
+            'aggregation': self.has_aggregation,
+            'group_by': self.has_group_by,
+            'where': self.has_where,
+            'limit': self.limit,
+            'shape': shape
+        }
+
+
+def analyze(sql):
+    """Walk the token stream of a SELECT/WITH statement and collect a QueryAnalysis."""
+    tokens = tokenize(sql)
+    while tokens and tokens[-1].text == ';':
+        tokens.pop()
+    analysis = QueryAnalysis()
+    analysis.kind = tokens[0].value if tokens else None
+    # One frame per parenthesis level; 'query' marks the outermost frame of a
+    # (sub)query and 'clause' is the clause the tokens of that level belong to
+    frames = [{'query': 0, 'clause': None}]
+    previous = None
+
+    for i, token in enumerate(tokens):
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        frame = frames[-1]
+        top_level = frame['query'] == 0
+        value = token.value
+
+        if token.text == '(':
+            if following is not None and following.value in ('select', 'with'):
+                frames.append({'query': len(frames), 'clause': None})
+            else:
+                frames.append({'query': frame['query'], 'clause': None if frame['clause'] == 'from' else frame['clause']})
+        elif token.text == ')':
+            if len(frames) > 1:
+                frames.pop()
+        elif value == 'group' and previous is not None and previous.value == 'within':
+            # Ordered-set aggregate, e.g. percentile_cont(0.5) WITHIN GROUP (ORDER BY ...)
+            pass
+        elif token.kind == 'word' and value in CLAUSES and frame['query'] == len(frames) - 1:
+            frame['clause'] = CLAUSES[value]
+            if top_level and len(frames) == 1:
+                if value == 'select':
+                    analysis.projected_columns = 1
+                    analysis.select_star = following is not None and following.text == '*'
+                analysis.has_where |= value == 'where'
+                analysis.has_group_by |= value == 'group'
+                if value == 'limit':
+                    analysis.has_limit = True
+                    if following is not None and following.kind == 'number':
+                        analysis.limit = int(float(following.text))
+        elif value == 'top' and len(frames) == 1 and previous is not None and previous.value in ('select', 'distinct', 'all'):
+            # Redshift SELECT TOP n
+            analysis.has_limit = True
+            if following is not None and following.kind == 'number':
+                analysis.limit = int(float(following.text))
+        elif value == 'fetch' and len(frames) == 1 and following is not None and following.value in ('first', 'next'):
+            # FETCH FIRST|NEXT [n] ROW|ROWS ONLY, n defaults to 1
+            analysis.has_limit = True
+            count = tokens[i + 2] if i + 2 < len(tokens) else None
+            analysis.limit = int(float(count.text)) if count is not None and count.kind == 'number' else 1
+        elif token.text == ',' and frame['clause'] == 'select' and len(frames) == 1:
+            analysis.projected_columns += 1
+        elif token.is_name and previous is not None and previous.kind == 'cast':
+            # Type name of a :: cast, e.g. gdf15::float8
+            pass
+        elif token.is_name and previous is not None and previous.text == '(' and i >= 2 and tokens[i - 2].value in DATE_PART_FUNCTIONS:
+            # Date part, e.g. extract(epoch from ...) or datediff(week, ...)
+            pass
+        elif value == 'approximate' and following is not None and following.value in AGGREGATES:
+            # APPROXIMATE COUNT(DISTINCT ...) and APPROXIMATE PERCENTILE_DISC(...)
+            pass
+        elif token.is_name:
+            in_tables = frame['clause'] == 'from'
+            if previous is not None and (previous.value == 'with' or previous.text == ',' and frame['clause'] == 'with'):
+                analysis.ctes.add(value)
+            elif following is not None and following.text == '(':
+                if value in AGGREGATES and frame['clause'] == 'select' and top_level:
+                    analysis.has_aggregation = True
+            elif following is not None and following.text == '.':
+                pass
+            elif previous is not None and previous.text == '.':
+                if in_tables:
+                    analysis.tables.add(value)
+                else:
+                    analysis.columns.append(value)
+            elif in_tables:
+                if previous is not None and (previous.value in JOIN_WORDS or previous.value == 'from' or previous.text == ','):
+                    analysis.tables.add(value)
+                else:
+                    analysis.aliases.add(value)
+            elif previous is not None and (previous.value in ('as', 'end') or previous.is_name or previous.kind in ('number', 'string') or previous.text == ')'):
+                analysis.aliases.add(value)
+            else:
+                analysis.columns.append(value)
+        previous = token
+
+    return analysis
+
+
+def validate_query(sql, schema, other_tables=()):
+    """
+    Check a query against the cached schema before it is sent to the cluster.
+
+    ``schema`` maps table names to lists of column dicts as returned by
+    /getschema; ``other_tables`` names tables that exist but whose columns
+    are not cached, so columns are not checked for queries touching them.
+    Raises SQLValidationError for unknown tables or columns and returns the
+    cost estimate of the query otherwise. Statements that are not SELECT or
+    WITH queries are not analyzed and return None.
+    """
+    analysis = analyze(sql)
+    if analysis.kind not in ('select', 'with'):
+        return None
+
+    tables = {table.lower(): {column['name'].lower() for column in columns} for table, columns in schema.items()}
+    other_tables = {table.lower() for table in other_tables}
+    qualifiers = {'dev', 'public'}
+    referenced = analysis.tables - analysis.ctes - qualifiers
+    for table in referenced:
+        if table not in tables and table not in other_tables:
+            raise SQLValidationError(f"Unknown table '{table}'." + _suggest(table, set(tables) | other_tables))
+
+    known_columns = set().union(*tables.values()) if tables else set()
+    # Columns of common table expressions and uncached tables cannot be checked
+    if not analysis.ctes and not referenced & other_tables:
+        names = known_columns | analysis.aliases | analysis.tables | qualifiers
+        for column in analysis.columns:
+            if column not in names:
+                raise SQLValidationError(f"Unknown column '{column}'." + _suggest(column, known_columns))
+    return analysis.estimate(len(known_columns))
+
+
+def cap_unaggregated_query(sql, estimate, max_rows):
+    """
+    Append a LIMIT to full-table or filtered selects that would return every
+    matching row. Queries that already limit their rows with LIMIT, TOP or
+    FETCH FIRST are returned unchanged, as Redshift rejects a second limit.
+    """
+    if estimate is None or estimate['shape'] not in ('full_scan', 'filtered_scan') or estimate.get('limit') is not None:
+        return sql
+    # Cut after the last token that is not a comment or a terminating semicolon
+    end = 0
+    for match in TOKEN.finditer(sql):
+        if match.lastgroup != 'space' and match.group() != ';':
+            end = match.end()
+    return f"{sql[:end]} LIMIT {max_rows}"
+
+
+def _suggest(name, candidates):
+    matches = difflib.get_close_matches(name, list(candidates), n=3)
+    return f" Did you mean: {', '.join(matches)}?" if matches else ""
@@ -2,17 +2,25 @@
 import json
 from lifelines import KaplanMeierFitter,CoxPHFitter
 import plotly.graph_objects as go
-import ast
 import io
 import kaleido
-import boto3
 import os
 import pandas as pd
 from lifelines import CoxPHFitter
 import numpy as np
+from scipy import stats
+from aws_clients import get_client, get_resource
+from columnar_arrays import ArraySource
+
+# numpy for the built-in Kaplan-Meier estimator, lifelines for the KaplanMeierFitter reference
+KM_ENGINE = os.environ.get('KM_ENGINE', 'numpy')
   
 def process_clinical_genomic_data(data):
     try:
+        # Typed row results from the database query tool map directly onto a DataFrame
+        if 'rows' in data and 'columns' in data:
+            return pd.DataFrame(data['rows'], columns=data['columns'])
+
         # Extract column names from ColumnMetadata
         columns = [col['name'] for col in data['ColumnMetadata']]
         print(columns)
@@ -26,6 +34,8 @@ def process_clinical_genomic_data(data):
                     row.append(value['stringValue'])
                 elif 'doubleValue' in value:
                     row.append(value['doubleValue'])
+                elif 'longValue' in value:
+                    row.append(value['longValue'])
                 elif 'booleanValue' in value:
                     row.append(value['booleanValue'])
                 else:
@@ -45,6 +55,27 @@ def process_clinical_genomic_data(data):
         return None
 
 
+def read_npz_result(s3, bucket, manifest):
+    """ Load a columnar .npz query result described by its JSON manifest into a data frame """
+    obj = s3.get_object(Bucket=bucket, Key=manifest['data_key'])
+    columns = {}
+    with np.load(io.BytesIO(obj['Body'].read())) as npz:
+        for col in manifest['columns']:
+            values = npz[col['entry']]
+            if col['nulls']:
+                values = pd.Series(values).mask(npz[col['entry'] + '_null'])
+            columns[col['name']] = values
+    return pd.DataFrame(columns)
+
+
+def load_query_result(s3, bucket, key):
+    """ Load the query result stored by the database query tool, as JSON rows or a columnar .npz """
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    data = json.loads(obj['Body'].read().decode('utf-8'))
+    if data.get('format') == 'npz':
+        data = read_npz_result(s3, bucket, data)
+    return data
+
 
 def fit_survival_regression_model(data):
     """ Fit Cox survival regression model to data and return a data frame """
@@ -57,7 +88,7 @@ def fit_survival_regression_model(data):
     # # Create the DataFrame
     # df = pd.DataFrame(rows)
     
-    df = process_clinical_genomic_data(data)
+    df = data if isinstance(data, pd.DataFrame) else process_clinical_genomic_data(data)
     
     
     # Convert 'Alive' and 'Dead' to 0 and 1, and ensure it's numeric
@@ -87,8 +118,234 @@ def fit_survival_regression_model(data):
     return summary
     
 
+def univariate_cox(durations, events, X, max_iter=50, tol=1e-9):
+    """
+    Fit one univariate Cox model per column of X at once, with Efron's
+    method for ties like lifelines' CoxPHFitter.
+
+    Subjects are sorted by duration once; the risk set sums of every
+    column come from reverse cumulative sums and all columns take their
+    Newton-Raphson steps together. Returns coefficients and standard
+    errors per column, NaN for constant columns.
+    """
+    order = np.argsort(durations, kind="stable")
+    durations = np.asarray(durations, dtype=float)[order]
+    events = np.asarray(events, dtype=float)[order]
+    X = np.asarray(X, dtype=float)[order]
+    # Standardize for numerical stability; coefficients are scaled back at the end
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    valid = scale > 0
+    Z = (X - mean) / np.where(valid, scale, 1)
+
+    # One entry per event: start of its risk set, tie group and rank within the ties
+    times, first = np.unique(durations, return_index=True)
+    event_rows = np.flatnonzero(events == 1)
+    event_times = np.searchsorted(times, durations[event_rows])
+    tie_groups, tie_counts = np.unique(event_times, return_counts=True)
+    group_of_event = np.searchsorted(tie_groups, event_times)
+    rank = np.arange(len(event_rows)) - np.searchsorted(group_of_event, group_of_event, side="left")
+    fraction = (rank / tie_counts[group_of_event])[:, None]
+    risk_start = first[event_times]
+    tie_sum = np.zeros((len(tie_groups), Z.shape[1]))
+    np.add.at(tie_sum, group_of_event, Z[event_rows])
+
+    beta = np.zeros(Z.shape[1])
+    for _ in range(max_iter):
+        w = np.exp(Z * beta)
+        sums = [np.cumsum(m[::-1], axis=0)[::-1] for m in (w, w * Z, w * Z * Z)]
+        tie_w = [np.zeros((len(tie_groups), Z.shape[1])) for _ in sums]
+        for tie, m in zip(tie_w, (w, w * Z, w * Z * Z)):
+            np.add.at(tie, group_of_event, m[event_rows])
+        s0, s1, s2 = (r[risk_start] - fraction * t[group_of_event] for r, t in zip(sums, tie_w))
+        ratio = s1 / s0
+        score = tie_sum.sum(axis=0) - ratio.sum(axis=0)
+        information = (s2 / s0 - ratio ** 2).sum(axis=0)
+        step = np.where(information > 0, score / np.where(information > 0, information, 1), 0)
+        step = np.clip(step, -5, 5)
+        beta += step
+        if np.all(np.abs(step) < tol):
+            break
+
+    coef = np.where(valid, beta / np.where(valid, scale, 1), np.nan)
+    se = np.where(valid & (information > 0), 1 / np.sqrt(np.where(information > 0, information, 1)) / np.where(valid, scale, 1), np.nan)
+    return coef, se
+
+
+def median_split_logrank(durations, events, X):
+    """
+    Log-rank test of high (> median) vs low expression for every column of X
+    at once. Returns the chi-square statistics and the log-rank score of the
+    high group (positive when it has more events than expected).
+    """
+    order = np.argsort(durations, kind="stable")
+    durations = np.asarray(durations, dtype=float)[order]
+    events = np.asarray(events, dtype=float)[order]
+    X = np.asarray(X, dtype=float)[order]
+    high = (X > np.median(X, axis=0)).astype(float)
+
+    times, first, counts = np.unique(durations, return_index=True, return_counts=True)
+    at_risk = len(durations) - first
+    deaths = np.add.reduceat(events, first)
+    high_at_risk = np.cumsum(high[::-1], axis=0)[::-1][first]
+    high_deaths = np.add.reduceat(high * events[:, None], first, axis=0)
+    has_events = deaths > 0
+    n, d = at_risk[has_events, None], deaths[has_events, None]
+    n1 = high_at_risk[has_events]
+    score = (high_deaths[has_events] - d * n1 / n).sum(axis=0)
+    variance = (d * (n1 / n) * (1 - n1 / n) * (n - d) / np.maximum(n - 1, 1)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = np.where(variance > 0, score ** 2 / variance, np.nan)
+    return statistic, score
+
+
+def benjamini_hochberg(p_values):
+    """ False discovery rate adjusted p-values (Benjamini-Hochberg), NaN entries are kept """
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full(len(p_values), np.nan)
+    tested = np.flatnonzero(~np.isnan(p_values))
+    order = tested[np.argsort(p_values[tested])]
+    ranked = p_values[order] * len(order) / np.arange(1, len(order) + 1)
+    adjusted[order] = np.minimum(1, np.minimum.accumulate(ranked[::-1])[::-1])
+    return adjusted
+
+
+# Numeric columns of clinical_genomic that are not biomarkers: the survival
+# outcome, and clinical data that is only screened when asked for by name
+OUTCOME_COLUMNS = ('survival_duration', 'survival_status', 'time_to_death')
+CLINICAL_COLUMNS = ('age_at_histological_diagnosis', 'weight_lbs', 'pack_years', 'days_between_ct_and_surgery')
+
+
+def parse_column_names(value):
+    """ Column names sent as a JSON list or as a bare list such as [gdf15, lrig1] """
+    try:
+        names = json.loads(value)
+    except json.JSONDecodeError:
+        names = value.strip().strip('[]').split(',')
+    if isinstance(names, str):
+        names = [names]
+    return [str(name).strip().strip('\'"') for name in names if str(name).strip()]
+
+
+def screen_survival_panel(data, method='cox', biomarkers=None):
+    """
+    Univariate survival screening of every numeric biomarker column in one pass.
+
+    The biomarkers are the given columns, or by default every numeric column
+    except the outcome and clinical columns (OUTCOME_COLUMNS, CLINICAL_COLUMNS).
+
+    With method 'cox' each biomarker gets its own univariate Cox model, with
+    'logrank' a log-rank test of high vs low (median split) expression. The
+    tests of all complete columns run vectorized together; columns with
+    missing values are tested on their complete rows. Returns a data frame
+    ranked by p-value with Benjamini-Hochberg FDR adjusted p-values.
+    """
+    df = data if isinstance(data, pd.DataFrame) else process_clinical_genomic_data(data)
+    if method not in ('cox', 'logrank'):
+        raise ValueError("method must be 'cox' or 'logrank'")
+    df = df.dropna(subset=['survival_duration', 'survival_status'])
+    durations = df['survival_duration'].astype(float).to_numpy()
+    events = df['survival_status'].astype(float).to_numpy()
+    if biomarkers:
+        unknown = [column for column in biomarkers if column not in df.columns]
+        if unknown:
+            raise ValueError(f"Biomarker columns not found in the data: {', '.join(unknown)}")
+        outcomes = [column for column in biomarkers if column in OUTCOME_COLUMNS]
+        if outcomes:
+            raise ValueError(f"Survival outcome columns cannot be screened as biomarkers: {', '.join(outcomes)}")
+        biomarkers = list(dict.fromkeys(biomarkers))
+    else:
+        biomarkers = [column for column in df.select_dtypes(include='number').columns
+                      if column not in OUTCOME_COLUMNS + CLINICAL_COLUMNS]
+
+    def test(rows, columns):
+        X = df[columns].to_numpy(dtype=float)[rows]
+        if method == 'cox':
+            coef, se = univariate_cox(durations[rows], events[rows], X)
+            z = coef / se
+            return {'coef': coef, 'exp(coef)': np.exp(coef), 'se(coef)': se, 'z': z,
+                    'p': 2 * stats.norm.sf(np.abs(z))}
+        statistic, score = median_split_logrank(durations[rows], events[rows], X)
+        return {'test_statistic': statistic, 'high_vs_low_score': score, 'p': stats.chi2.sf(statistic, 1)}
+
+    missing = df[biomarkers].isna()
+    complete = [column for column in biomarkers if not missing[column].any()]
+    results = []
+    if complete:
+        results.append(pd.DataFrame(test(np.arange(len(df)), complete), index=complete).assign(n=len(df)))
+    for column in biomarkers:
+        if column not in complete:
+            rows = np.flatnonzero(~missing[column].to_numpy())
+            results.append(pd.DataFrame(test(rows, [column]), index=[column]).assign(n=len(rows)))
+    if not results:
+        raise ValueError("No numeric biomarker columns to screen")
+
+    summary = pd.concat(results)
+    summary['fdr'] = benjamini_hochberg(summary['p'].to_numpy())
+    summary.index.name = 'biomarker'
+    return summary.sort_values('p')
+
+
+def km_estimate(durations, event_observed, alpha=0.05):
+    """
+    Kaplan-Meier estimate with exponential Greenwood confidence intervals for
+    one group, matching lifelines' KaplanMeierFitter.
+
+    The event table (subjects removed and events at each distinct duration)
+    is counted by np.unique with return_counts, once over all durations and
+    once over the durations with an event. Both are plain sorts; asking
+    np.unique for the inverse indices of a million durations instead costs
+    an argsort that took longer than lifelines' whole fit. Returns the
+    (timeline, survival, lower, upper) arrays, with the timeline starting
+    at 0.
+    """
+    durations = np.asarray(durations, dtype=float)
+    observed = np.asarray(event_observed).astype(bool)
+    timeline, removed = np.unique(durations, return_counts=True)
+    event_times, event_counts = np.unique(durations[observed], return_counts=True)
+    events = np.zeros(len(timeline))
+    events[np.searchsorted(timeline, event_times)] = event_counts
+    at_risk = np.cumsum(removed[::-1])[::-1].astype(float)
+    if timeline[0] != 0:
+        timeline, events, at_risk = np.concatenate(([0.0], timeline)), np.concatenate(([0.0], events)), np.concatenate(([at_risk[0]], at_risk))
+    z = stats.norm.ppf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Product-limit estimate as a cumulative sum of logs, like lifelines
+        log_survival = np.cumsum(np.log(at_risk - events) - np.log(at_risk))
+        variance_terms = events / (at_risk * (at_risk - events))
+        variance = np.cumsum(np.where(np.isinf(variance_terms), 0, variance_terms))
+        lower = np.exp(-np.exp(np.log(-log_survival) - z * np.sqrt(variance) / log_survival))
+        upper = np.exp(-np.exp(np.log(-log_survival) + z * np.sqrt(variance) / log_survival))
+    return timeline, np.exp(log_survival), np.nan_to_num(lower, nan=1.0), np.nan_to_num(upper, nan=1.0)
+
+
+def fit_km_groups(groups):
+    """
+    Fit Kaplan-Meier models for several groups, given as a dict of name to
+    (durations, event_observed), and return a data frame per group in the
+    format of fit_km.
+    """
+    if KM_ENGINE == 'lifelines':
+        return {name: fit_km_lifelines(name, durations, event_observed) for name, (durations, event_observed) in groups.items()}
+    frames = {}
+    for name, (durations, event_observed) in groups.items():
+        timeline, survival, lower, upper = km_estimate(durations, event_observed)
+        frames[name] = pd.DataFrame({
+            'timeline': timeline,
+            name: survival,
+            f"{name}_lower_0.95": lower,
+            f"{name}_upper_0.95": upper
+        })
+    return frames
+
+
 def fit_km(name, durations, event_observed):
     """ Fit Kaplan-Meier model to data and return a data frame """
+    return fit_km_groups({name: (durations, event_observed)})[name]
+
+
+def fit_km_lifelines(name, durations, event_observed):
+    """ Reference implementation of fit_km with lifelines' KaplanMeierFitter """
     kmf = KaplanMeierFitter()
     kmf.fit(durations=durations, event_observed=event_observed, label=name)
     df = kmf.survival_function_.copy(deep=True)
@@ -97,7 +354,6 @@ def fit_km(name, durations, event_observed):
     df[lo95] = kmf.confidence_interval_[lo95]
     df[hi95] = kmf.confidence_interval_[hi95]
     df.reset_index(inplace=True)
-    print(df)
     return df
 
 
@@ -142,12 +398,12 @@ def plot_kaplan_meier(biomarker_name:str
     print(duration_baseline)
     print("\nevent_baseline:")
     print(event_baseline)
-    df_baseline = fit_km(baseline, duration_baseline, event_baseline)
-    #print("\df_baseline:" + str(df_baseline))
-    #print("\duration_condition:" + str(duration_condition))
-    #print("\event_condition:" + str(event_condition))
-    df_condition = fit_km(condition, duration_condition, event_condition)
-    #print("\df_condition:" + str(df_condition))
+    # Both groups are fitted in one pass
+    frames = fit_km_groups({
+        baseline: (duration_baseline, event_baseline),
+        condition: (duration_condition, event_condition)
+    })
+    df_baseline, df_condition = frames[baseline], frames[condition]
     fig = plotly_km(df_baseline, baseline, line_color='rgba(0,0,255,1)', fill_color='rgba(0, 0, 255, 0.2)', fig=None)
     fig = plotly_km(df_condition, condition, line_color='rgba(255,140,0,1)', fill_color='rgba(255, 140, 0, 0.2)', fig=fig)
     fig.update_layout(title_text=f"{biomarker_name}\n"
@@ -165,7 +421,7 @@ def save_plot(fig,s3_bucket):
     img_data = io.BytesIO()
     fig.write_image(img_data, format='png')
     img_data.seek(0)
-    s3 = boto3.resource('s3')
+    s3 = get_resource('s3')
     bucket = s3.Bucket(s3_bucket)
     invocationID = 1
     KEY = 'graphs/invocationID/' + str(invocationID) + '/KMplot.png' 
@@ -203,13 +459,13 @@ def lambda_handler(event, context):
             print(os.environ['S3_BUCKET'])
             s3_bucket = os.environ['S3_BUCKET']
             
-            print(type(duration_baseline))
-            print(duration_baseline)
-            duration_baseline = ast.literal_eval(duration_baseline)
-            event_baseline = ast.literal_eval(event_baseline)
-            duration_condition = ast.literal_eval(duration_condition)
-            event_condition = ast.literal_eval(event_condition)
-            print(type(duration_baseline))
+            # Inline lists or s3://bucket/key#column references, e.g. the groups stored by the survival data tools
+            source = ArraySource(get_client('s3'))
+            duration_baseline = source.array(duration_baseline, 'duration_baseline')
+            event_baseline = source.array(event_baseline, 'event_baseline')
+            duration_condition = source.array(duration_condition, 'duration_condition')
+            event_condition = source.array(event_condition, 'event_condition')
+            print(f"Baseline: {len(duration_baseline)} patients, condition: {len(duration_condition)} patients")
             baseline = '<=10' 
             condition = '>10'
             # Execute your business logic here. For more information, refer to: https://docs.aws.amazon.com/bedrock/latest/userguide/agents-lambda.html
@@ -230,7 +486,7 @@ def lambda_handler(event, context):
     if function == "fit_survival_regression":
         bucket = ''
         key = ''
-        s3 = boto3.client('s3')
+        s3 = get_client('s3')
         for param in parameters:
             if param["name"] == "bucket":
                 bucket = param["value"]
@@ -239,8 +495,7 @@ def lambda_handler(event, context):
                 key = param["value"]
                 print(key)
         try:
-            obj = s3.get_object(Bucket=bucket, Key=key)
-            data = json.loads(obj['Body'].read().decode('utf-8'))
+            data = load_query_result(s3, bucket, key)
             summary = fit_survival_regression_model(data)
             responseBody = {
                 "TEXT": {
@@ -256,6 +511,31 @@ def lambda_handler(event, context):
             }
             print(f"Error: {error_message}")
 
+    if function == "screen_survival_biomarkers":
+        values = {param["name"]: param["value"] for param in parameters}
+        try:
+            data = load_query_result(get_client('s3'), values.get("bucket", ""), values.get("key", ""))
+            biomarkers = values.get("biomarkers")
+            summary = screen_survival_panel(
+                data,
+                method=values.get("method", "cox"),
+                biomarkers=parse_column_names(biomarkers) if biomarkers else None
+            )
+            top = int(values.get("top", 20))
+            responseBody = {
+                "TEXT": {
+                    "body": "The function {} was called successfully! {} biomarkers were screened, ranked by p-value (fdr is the Benjamini-Hochberg adjusted p-value):\n{}".format(function, len(summary), summary.head(top).to_string())
+                }
+            }
+        except Exception as e:
+            error_message = str(e)
+            responseBody = {
+                "TEXT": {
+                    "body": f"An error occurred while processing the function {function}: {error_message}"
+                }
+            }
+            print(f"Error: {error_message}")
+
     action_response = {
         'actionGroup': actionGroup,
         'function': function,
@@ -0,0 +1,65 @@
+"""
+Shared boto3 client factory for the action group Lambdas.
+
+Clients and resources are created lazily on first use and kept at module
+level, so warm invocations reuse the resolved credentials, endpoints and
+pooled keep-alive connections instead of rebuilding them on every call.
+
+The build copies this file next to each Lambda handler before packaging.
+"""
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+DEFAULT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25')),
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60,
+    retries={'max_attempts': 5, 'mode': 'adaptive'}
+)
+
+_session = None
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_client(service_name, **config):
+    """
+    Return the shared client for a service.
+
+    Keyword arguments are botocore Config options merged over the defaults,
+    e.g. ``read_timeout=300`` for long model invocations; each distinct set of
+    options gets its own cached client.
+    """
+    key = (service_name, tuple(sorted(config.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client_config = DEFAULT_CONFIG.merge(Config(**config)) if config else DEFAULT_CONFIG
+                client = _get_session().client(service_name, config=client_config)
+                _clients[key] = client
+    return client
+
+
+def get_resource(service_name):
+    """Return the shared boto3 resource for a service, e.g. ``get_resource('s3')``."""
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = _get_session().resource(service_name, config=DEFAULT_CONFIG)
+                _resources[service_name] = resource
+    return resource
@@ -0,0 +1,124 @@
+"""
+Array parameters for the survival action groups, passed inline or by S3 reference.
+
+An array parameter is either an inline JSON (or Python) list or a reference
+``s3://<bucket>/<key>#<column>`` to one column of a columnar object: the
+JSON manifest of a query result spilled by the database query tool, the
+.npz archive it points to, or a .npz written by ``ArraySource.store``.
+Without ``#<column>`` the column is named after the parameter, e.g.
+``survival_duration``. Columns are read straight from the .npy buffers, so
+the cohort size is no longer bounded by the agent payload.
+
+The build copies this file next to each Lambda handler before packaging.
+"""
+import ast
+import io
+import json
+import re
+import uuid
+import numpy as np
+
+S3_REFERENCE = re.compile(r"^s3://([^/]+)/([^#]+)(?:#(.+))?$")
+
+
+def parse_reference(value):
+    """Return (bucket, key, column) for an S3 array reference, None for inline values."""
+    if not isinstance(value, str):
+        return None
+    match = S3_REFERENCE.match(value.strip())
+    return match.groups() if match else None
+
+
+def parse_inline(value, dtype=float):
+    """Decode an inline JSON or Python list literal into a NumPy array."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            value = ast.literal_eval(value)
+    return np.asarray(value, dtype=dtype)
+
+
+class ArraySource:
+    """
+    Resolves array parameters for one invocation.
+
+    Objects are downloaded once however many parameters reference them,
+    and only the columns that are asked for are decoded. Nulls of numeric
+    columns become NaN.
+    """
+
+    def __init__(self, s3):
+        self.s3 = s3
+        self.objects = {}
+        self.referenced = None
+
+    def array(self, value, name=None, dtype=float):
+        reference = parse_reference(value)
+        if reference is None:
+            return parse_inline(value, dtype=dtype)
+        bucket, key, column = reference
+        self.referenced = self.referenced or (bucket, key)
+        columns = self._columns(bucket, key)
+        column = column or name
+        if column not in columns:
+            raise ValueError(f"Column {column} not found in s3://{bucket}/{key}, available: {', '.join(columns)}")
+        values, nulls = columns[column]()
+        values = np.asarray(values, dtype=dtype)
+        if nulls is not None and nulls.any():
+            values = values.astype(float)
+            values[nulls] = np.nan
+        return values
+
+    def _columns(self, bucket, key):
+        """Return a mapping of column name to a loader of (values, nulls) for an object."""
+        if (bucket, key) not in self.objects:
+            body = self.s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+            if key.endswith('.npz'):
+                self.objects[bucket, key] = self._npz_columns(body)
+            else:
+                self.objects[bucket, key] = self._json_columns(bucket, json.loads(body.decode('utf-8')))
+        return self.objects[bucket, key]
+
+    def _npz_columns(self, body, manifest=None):
+        npz = np.load(io.BytesIO(body))
+        if manifest is None:
+            return {name: (lambda name=name: (npz[name], None)) for name in npz.files}
+        return {
+            col['name']: (lambda col=col: (npz[col['entry']], npz[col['entry'] + '_null'] if col['nulls'] else None))
+            for col in manifest['columns']
+        }
+
+    def _json_columns(self, bucket, data):
+        if isinstance(data, list):
+            # Batch spills hold one {"query", "result"|"error"} entry per query
+            raise ValueError(
+                f"Object holds the results of a batch of {len(data)} queries; "
+                "run the query on its own to spill a single result and reference its columns"
+            )
+        if not isinstance(data, dict):
+            raise ValueError("Unsupported object, expected a query result or an .npz archive")
+        if data.get('format') == 'npz':
+            body = self.s3.get_object(Bucket=bucket, Key=data['data_key'])['Body'].read()
+            return self._npz_columns(body, data)
+        if 'rows' in data and 'columns' in data:
+            # Typed row results from the database query tool
+            return {
+                name: (lambda i=i: self._json_column(data['rows'], i))
+                for i, name in enumerate(data['columns'])
+            }
+        raise ValueError("Unsupported object, expected a query result or an .npz archive")
+
+    @staticmethod
+    def _json_column(rows, i):
+        values = [row[i] for row in rows]
+        nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        return [np.nan if value is None else value for value in values], nulls
+
+    def store(self, bucket, arrays, prefix='survival-groups/'):
+        """Write named arrays as one .npz object and return their S3 references."""
+        key = f"{prefix}{uuid.uuid4()}.npz"
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        self.s3.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        return {name: f"s3://{bucket}/{key}#{name}" for name in arrays}
@@ -1,55 +1,249 @@
-
 import json
-import ast
+import math
+import numpy as np
+from aws_clients import get_client
+from columnar_arrays import ArraySource, parse_inline
+
+
+def complete_cases(*arrays):
+    """ Drop the patients with a missing value in any of the aligned arrays """
+    if len({len(array) for array in arrays}) > 1:
+        raise ValueError("The biomarker, survival duration and survival status arrays must have the same length")
+    complete = ~np.any([np.isnan(array) for array in arrays], axis=0)
+    return [array[complete] for array in arrays]
+
 
-def group_survival_data(biomarker: list, survival_duration: list, survival_status: list, threshold: float):
+def reference_groups(data, source):
+    """
+    Store the durations and events of every group in S3 and replace them by
+    references that plot_kaplan_meier accepts, so large cohorts loaded from
+    S3 do not have to pass through the agent either.
+    """
+    if "groups" in data:
+        groups = {group["name"]: group for group in data["groups"]}
+    else:
+        groups = {name: data[name] for name in ("baseline", "condition")}
+    arrays = {}
+    for name, group in groups.items():
+        arrays[name + "_durations"] = np.asarray(group["durations"], dtype=float)
+        arrays[name + "_events"] = np.asarray(group["events"], dtype=np.int8)
+    references = source.store(source.referenced[0], arrays)
+    for name, group in groups.items():
+        group["patients"] = len(group["durations"])
+        group["durations"] = references[name + "_durations"]
+        group["events"] = references[name + "_events"]
+    return data
+
+
+def group_survival_data(biomarker, survival_duration, survival_status, threshold: float, output=json.dumps):
     """
     Separate biomarker values, survival durations, and survival statuses into two groups
     based on a given threshold.
 
     Args:
-        biomarker (list): List of biomarker values.
-        survival_duration (list): List of survival durations.
-        survival_status (list): List of survival statuses (0 for Alive, 1 for Dead).
+        biomarker (array-like): Biomarker values.
+        survival_duration (array-like): Survival durations.
+        survival_status (array-like): Survival statuses (0 for Alive, 1 for Dead).
         threshold (float): Threshold value for separating the data.
+        output (callable): Serializes the result dictionary, JSON by default.
 
     Returns:
-        tuple: A tuple containing four lists:
-            - baseline_durations: Survival durations for the baseline group.
-            - baseline_events: Survival statuses for the baseline group.
-            - condition_durations: Survival durations for the condition group.
-            - condition_events: Survival statuses for the condition group.
+        str: JSON with the survival durations and events of the baseline group
+        (biomarker value <= threshold) and the condition group.
     """
-    baseline_durations = []
-    baseline_events = []
-    condition_durations = []
-    condition_events = []
-
-    for i, value in enumerate(biomarker):
-        print(value)
-        print(type(value))
-        if float(value) <= float(threshold):
-            baseline_durations.append(survival_duration[i])
-            baseline_events.append(survival_status[i])
-        else:
-            condition_durations.append(survival_duration[i])
-            condition_events.append(survival_status[i])
+    biomarker = np.asarray(biomarker, dtype=float)
+    survival_duration = np.asarray(survival_duration, dtype=float)
+    survival_status = np.asarray(survival_status, dtype=float).astype(np.int8)
+
+    baseline = biomarker <= float(threshold)
+    condition = ~baseline
     # Create a dictionary with the output data
     data = {
         "baseline": {
-            "durations": baseline_durations,
-            "events": baseline_events
+            "durations": survival_duration[baseline].tolist(),
+            "events": survival_status[baseline].tolist()
         },
         "condition": {
-            "durations": condition_durations,
-            "events": condition_events
+            "durations": survival_duration[condition].tolist(),
+            "events": survival_status[condition].tolist()
         }
     }
 
-    # Convert the dictionary to JSON
-    json_data = json.dumps(data)
+    return output(data)
+
+
+def group_survival_data_multi(biomarker, survival_duration, survival_status, thresholds=None, groups=None, output=json.dumps):
+    """
+    Separate the data into k groups at several cut points, e.g. tertiles or
+    quartiles of the biomarker, in one call.
+
+    Args:
+        biomarker (array-like): Biomarker values.
+        survival_duration (array-like): Survival durations.
+        survival_status (array-like): Survival statuses (0 for Alive, 1 for Dead).
+        thresholds (array-like, optional): Cut points; a value belongs to the
+            first group whose upper cut point it does not exceed.
+        groups (int, optional): Number of equally sized groups, used when no
+            thresholds are given; the cut points are the biomarker quantiles.
+        output (callable): Serializes the result dictionary, JSON by default.
+
+    Tied biomarker values can make quantiles coincide, and thresholds can
+    lie outside the data, which would leave a group empty. Such a group is
+    merged into its neighbour by dropping the cut point between them; the
+    dropped cut points are listed in the result.
+
+    Returns:
+        str: JSON with a list of groups, each with its biomarker range,
+        survival durations and events.
+
+    Raises:
+        ValueError: if no cut point leaves patients on both sides.
+    """
+    biomarker = np.asarray(biomarker, dtype=float)
+    survival_duration = np.asarray(survival_duration, dtype=float)
+    survival_status = np.asarray(survival_status, dtype=float).astype(np.int8)
+
+    if thresholds is not None and len(thresholds):
+        cuts = np.unique(np.asarray(thresholds, dtype=float))
+    elif groups is not None and int(groups) >= 2:
+        cuts = np.unique(np.quantile(biomarker, np.linspace(0, 1, int(groups) + 1)[1:-1]))
+    else:
+        raise ValueError("Either thresholds or a number of groups (at least 2) is required")
+
+    dropped = []
+    while len(cuts):
+        # Index of the group of every value, with the same "<= cut point" rule as group_survival_data
+        labels = np.searchsorted(cuts, biomarker, side="left")
+        empty = np.flatnonzero(np.bincount(labels, minlength=len(cuts) + 1) == 0)
+        if not len(empty):
+            break
+        # The cut above an empty group, or below it for the last group
+        i = min(empty[0], len(cuts) - 1)
+        dropped.append(float(cuts[i]))
+        cuts = np.delete(cuts, i)
+    if not len(cuts):
+        raise ValueError(
+            f"Cannot separate the patients into groups: every biomarker value is on the same side "
+            f"of the cut points {sorted(dropped)}, e.g. because the values are tied"
+        )
+
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(len(cuts) + 2))
+
+    data = {"thresholds": cuts.tolist(), "dropped_thresholds": sorted(dropped), "groups": []}
+    for i in range(len(cuts) + 1):
+        members = order[bounds[i]:bounds[i + 1]]
+        if i == 0:
+            value_range = f"<= {cuts[0]:g}"
+        elif i == len(cuts):
+            value_range = f"> {cuts[-1]:g}"
+        else:
+            value_range = f"> {cuts[i - 1]:g} and <= {cuts[i]:g}"
+        data["groups"].append({
+            "name": f"group_{i + 1}",
+            "range": value_range,
+            "durations": survival_duration[members].tolist(),
+            "events": survival_status[members].tolist()
+        })
+
+    return output(data)
+
 
-    return json_data
+def find_optimal_cutpoint(biomarker, survival_duration, survival_status, min_group_fraction: float = 0.1, output=json.dumps):
+    """
+    Find the biomarker threshold that best separates survival, using the
+    maximally selected log-rank statistic.
+
+    Every distinct biomarker value that leaves at least ``min_group_fraction``
+    of the patients in each group is a candidate cut. Patients are moved
+    from the condition group to the baseline group in biomarker order, and
+    the log-rank score and variance are updated incrementally over the
+    event times instead of refitting the test for every cut.
+
+    Args:
+        biomarker (array-like): Biomarker values.
+        survival_duration (array-like): Survival durations.
+        survival_status (array-like): Survival statuses (0 for Alive, 1 for Dead).
+        min_group_fraction (float): Smallest share of patients in either group.
+        output (callable): Serializes the result dictionary, JSON by default.
+
+    Returns:
+        str: JSON with the best threshold, its log-rank statistic, the raw
+        p-value, the p-value adjusted for the cut-point search (Lausen and
+        Schumacher, 1992) and the resulting baseline and condition groups.
+    """
+    biomarker = np.asarray(biomarker, dtype=float)
+    survival_duration = np.asarray(survival_duration, dtype=float)
+    survival_status = np.asarray(survival_status, dtype=float).astype(np.int8)
+    min_group_fraction = float(min_group_fraction)
+    if not 0 < min_group_fraction < 0.5:
+        raise ValueError("min_group_fraction must be between 0 and 0.5")
+    total = len(biomarker)
+
+    # Event table: distinct event times, patients at risk and events at each
+    times, events = np.unique(survival_duration[survival_status == 1], return_counts=True)
+    if not len(times):
+        raise ValueError("At least one event is required")
+    at_risk = total - np.searchsorted(np.sort(survival_duration), times, side="left")
+    weights = np.where(at_risk > 1, events * (at_risk - events) / np.maximum(at_risk - 1, 1), 0.0)
+    # Score contribution of moving a patient into the baseline group
+    expected = np.concatenate(([0.0], np.cumsum(events / at_risk)))
+    risk_times = np.searchsorted(times, survival_duration, side="right")
+    score_changes = survival_status - expected[risk_times]
+
+    order = np.argsort(biomarker, kind="stable")
+    values = biomarker[order]
+    block_ends = np.flatnonzero(np.diff(values)) + 1
+    block_starts = np.concatenate(([0], block_ends))
+    block_ends = np.concatenate((block_ends, [total]))
+    min_size = max(1, math.ceil(min_group_fraction * total))
+
+    baseline_at_risk = np.zeros(len(times))
+    score = 0.0
+    best = None
+    for start, end in zip(block_starts, block_ends):
+        members = order[start:end]
+        score += score_changes[members].sum()
+        # Each moved patient is at risk at every event time up to its duration
+        counts = np.bincount(risk_times[members], minlength=len(times) + 1)
+        baseline_at_risk += np.cumsum(counts[::-1])[::-1][1:]
+        if end < min_size or total - end < min_size:
+            continue
+        variance = np.sum(weights * baseline_at_risk * (at_risk - baseline_at_risk) / at_risk ** 2)
+        if variance <= 0:
+            continue
+        statistic = score / math.sqrt(variance)
+        if best is None or abs(statistic) > abs(best[1]):
+            best = (values[end - 1], statistic)
+    if best is None:
+        raise ValueError("No threshold leaves enough patients in both groups")
+
+    threshold, statistic = best
+    z = abs(statistic)
+    density = math.exp(-z * z / 2) / math.sqrt(2 * math.pi)
+    low, high = min_group_fraction, 1 - min_group_fraction
+    adjusted = density * (z - 1 / z) * math.log(high * (1 - low) / ((1 - high) * low)) + 4 * density / z
+    raw = math.erfc(z / math.sqrt(2))
+
+    baseline = biomarker <= threshold
+    condition = ~baseline
+    data = {
+        "threshold": float(threshold),
+        "test_statistic": statistic * statistic,
+        "p_value": raw,
+        "adjusted_p_value": min(1.0, max(raw, adjusted)),
+        # A positive score means more deaths than expected at low biomarker values
+        "higher_risk_group": "baseline" if statistic > 0 else "condition",
+        "baseline": {
+            "durations": survival_duration[baseline].tolist(),
+            "events": survival_status[baseline].tolist()
+        },
+        "condition": {
+            "durations": survival_duration[condition].tolist(),
+            "events": survival_status[condition].tolist()
+        }
+    }
+    return output(data)
 
 
 def lambda_handler(event, context):
@@ -58,31 +252,32 @@ def lambda_handler(event, context):
     function = event['function']
     parameters = event.get('parameters', [])
     try:
+        values = {param["name"]: param["value"] for param in parameters}
+        # Arrays are inline lists or s3://bucket/key#column references to a stored query result
+        source = ArraySource(get_client('s3'))
+        arrays = complete_cases(*(
+            source.array(values[name], name) for name in ("biomarker", "survival_duration", "survival_status")
+        ))
+        output = json.dumps
+        if source.referenced:
+            output = lambda data: json.dumps(reference_groups(data, source))
+
         if function == "group_survival_data":
-            for param in parameters:
-                if param["name"] == "biomarker":
-                    biomarker = param["value"]
-                if param["name"] == "survival_duration":
-                    survival_duration = param["value"]
-                if param["name"] == "survival_status":
-                    survival_status = param["value"]
-                if param["name"] == "threshold":
-                    threshold = param["value"]
-            print(type(biomarker))
-            print(biomarker)
-            print(survival_duration)
-            print(survival_status)
-            print(threshold)
-            biomarker = ast.literal_eval(biomarker)
-            survival_duration = ast.literal_eval(survival_duration)
-            survival_status = ast.literal_eval(survival_status)
-            print(type(biomarker))
-            print(biomarker)
-            print(survival_duration)
-            print(survival_status)
-            print(threshold)
-            
-            json_data = group_survival_data(biomarker, survival_duration, survival_status, threshold)
+            json_data = group_survival_data(*arrays, values["threshold"], output=output)
+        elif function == "group_survival_data_multi":
+            thresholds = values.get("thresholds")
+            json_data = group_survival_data_multi(
+                *arrays,
+                thresholds=parse_inline(thresholds) if thresholds else None,
+                groups=values.get("groups"),
+                output=output
+            )
+        elif function == "find_optimal_cutpoint":
+            json_data = find_optimal_cutpoint(
+                *arrays,
+                min_group_fraction=values.get("min_group_fraction", 0.1),
+                output=output
+            )
 
         # Execute your business logic here. For more information, refer to: https://docs.aws.amazon.com/bedrock/latest/userguide/agents-lambda.html
         responseBody =  {
@@ -90,16 +285,16 @@ def lambda_handler(event, context):
                 "body": json_data
             }
         }
-    
+
         action_response = {
             'actionGroup': actionGroup,
             'function': function,
             'functionResponse': {
                 'responseBody': responseBody
             }
-    
+
         }
-    
+
         dummy_function_response = {'response': action_response}
         print("Response: {}".format(dummy_function_response))
         return dummy_function_response
@@ -108,4 +303,4 @@ def lambda_handler(event, context):
         print(f"Error occurred: {error_message}")
         return error_message
 
-    
+
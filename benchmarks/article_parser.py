@@ -0,0 +1,59 @@
+"""
+Streaming efetch parsing with article_parser.iter_articles against the
+xmltodict path it replaced (PUBMED_XML_PARSER=xmltodict), on payloads built
+from the PubMed fixture. Both must give the same article records; time and
+peak memory allocated while parsing are reported.
+
+    python benchmarks/article_parser.py [--articles 10 100 1000]
+"""
+import argparse
+import io
+import os
+import tracemalloc
+
+from common import best_of, efetch_payload, report, use_lambda
+
+use_lambda('pubmed-lambda-function')
+os.environ.setdefault('ARTICLE_CACHE_PATH', '')
+import xmltodict  # noqa: E402
+from article_parser import iter_articles  # noqa: E402
+from PubMed import PubMed  # noqa: E402
+
+
+def peak_allocation(function):
+    """Peak memory in bytes allocated by ``function``."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    pubmed = PubMed()
+
+    def stream(data):
+        return list(iter_articles(io.BytesIO(data)))
+
+    def tree(data):
+        return pubmed._parse_articles(xmltodict.parse(data, fast=True, attr_whitelist=('Label',)))
+
+    rows = []
+    for count in args.articles:
+        data = efetch_payload(count)
+        stream_time, streamed = best_of(lambda: stream(data), args.repeat)
+        tree_time, parsed = best_of(lambda: tree(data), args.repeat)
+        assert streamed == parsed, 'article records differ'
+        rows.append([count, len(data) // 1024, tree_time * 1000, stream_time * 1000, tree_time / stream_time,
+                     peak_allocation(lambda: tree(data)) // 1024, peak_allocation(lambda: stream(data)) // 1024])
+    report(rows, ['articles', 'KiB', 'xmltodict ms', 'iterparse ms', 'speedup', 'xmltodict peak KiB',
+                  'iterparse peak KiB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Creating a boto3 client in every invocation, as the Lambdas did before,
+against the shared clients of aws_clients.get_client. Creating a client
+loads the service model and resolves credentials and the endpoint without
+any network call. With ``--bucket``, a head_bucket call is also timed on a
+new client per call and on the shared client. That shows the TLS
+handshakes saved by the pooled keep-alive connections, and needs AWS
+credentials.
+
+    python benchmarks/aws_clients.py [--calls 20] [--bucket my-bucket]
+"""
+import argparse
+import os
+import time
+
+from common import report, use_lambda
+
+use_lambda('querydatabaselambda')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+import boto3  # noqa: E402
+import aws_clients  # noqa: E402
+
+SERVICES = ('s3', 'bedrock-runtime', 'redshift-data')
+
+
+def per_call(calls, function):
+    """Mean seconds per call of ``function`` over ``calls`` calls."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--bucket', help='S3 bucket for timing head_bucket requests')
+    args = parser.parse_args()
+
+    rows = []
+    for service in SERVICES:
+        new = per_call(args.calls, lambda: boto3.client(service))
+        start = time.perf_counter()
+        aws_clients.get_client(service)
+        cold = time.perf_counter() - start
+        warm = per_call(args.calls, lambda: aws_clients.get_client(service))
+        rows.append([service, new * 1000, cold * 1000, warm * 1000])
+    report(rows, ['service', 'new client ms', 'first get_client ms', 'warm get_client ms'])
+
+    if args.bucket:
+        s3 = aws_clients.get_client('s3')
+        s3.head_bucket(Bucket=args.bucket)
+        new = per_call(args.calls, lambda: boto3.client('s3').head_bucket(Bucket=args.bucket))
+        shared = per_call(args.calls, lambda: s3.head_bucket(Bucket=args.bucket))
+        print()
+        report([[args.bucket, new * 1000, shared * 1000]], ['bucket', 'new client ms', 'shared client ms'])
+
+
+if __name__ == '__main__':
+    main()
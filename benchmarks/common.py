@@ -0,0 +1,52 @@
+"""
+Helpers shared by the benchmark scripts. Run the scripts from anywhere,
+e.g. ``python benchmarks/km_estimates.py``; they need the same packages as
+the Lambda they measure.
+"""
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+
+
+def use_lambda(directory):
+    """Make the modules of a Lambda importable, as if packaged flat with the shared modules."""
+    for path in ('shared', directory):
+        sys.path.insert(0, os.path.join(ROOT, 'ActionGroups', path))
+
+
+def efetch_payload(count, first_pmid=35000000):
+    """
+    An efetch response body with ``count`` articles, made by repeating the
+    records of fixtures/efetch_pubmed_articles.xml under new PMIDs.
+    """
+    with open(os.path.join(FIXTURES, 'efetch_pubmed_articles.xml'), encoding='utf-8') as f:
+        text = f.read()
+    records = re.findall(r'<PubmedArticle>.*?</PubmedArticle>\n', text, re.S)
+    pmids = [re.search(r'<PMID Version="1">(\d+)</PMID>', record).group(1) for record in records]
+    articles = [
+        records[i % len(records)].replace(pmids[i % len(records)], str(first_pmid + i))
+        for i in range(count)
+    ]
+    return ('<?xml version="1.0" ?>\n<PubmedArticleSet>\n' + ''.join(articles) + '</PubmedArticleSet>\n').encode('utf-8')
+
+
+def best_of(function, repeat=5):
+    """Fastest of ``repeat`` runs of ``function``, in seconds, and its last result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(rows, headers):
+    """Print rows of values as an aligned table."""
+    rows = [[f'{value:.4g}' if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print('  '.join(str(cell).rjust(width) for cell, width in zip(row, widths)))
@@ -0,0 +1,60 @@
+"""
+One batched efetch request for all search hits against one request per
+UID, as lazy_load did before, on the local E-utilities stub of the tests
+with a simulated round trip and the NCBI request rate. Both must give
+the same articles.
+
+    python benchmarks/efetch_batching.py [--results 5 20 100] [--latency 0.15] [--rate 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import ROOT, report, use_lambda
+
+use_lambda('pubmed-lambda-function')
+sys.path.insert(0, os.path.join(ROOT, 'tests', 'pubmed-lambda-function'))
+os.environ.setdefault('ARTICLE_CACHE_PATH', '')
+from eutils import EutilsSession  # noqa: E402
+from eutils_stub import StubEutils  # noqa: E402
+from PubMed import PubMed  # noqa: E402
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, nargs='+', default=[5, 20, 100])
+    parser.add_argument('--latency', type=float, default=0.15, help='seconds per request')
+    parser.add_argument('--rate', type=int, default=10, help='requests per second, 3 without an API key')
+    args = parser.parse_args()
+
+    server = StubEutils(latency=args.latency).start()
+    pubmed = PubMed()
+    pubmed.base_url_efetch = server.base_url + 'efetch.fcgi?'
+    rows = []
+    try:
+        for count in args.results:
+            uids = [str(10000 + i) for i in range(count)]
+            pubmed.session = EutilsSession(args.rate)
+            requests = len(server.requests)
+            single_time, single = timed(lambda: [pubmed.retrieve_article(uid, '') for uid in uids])
+            single_requests = len(server.requests) - requests
+            pubmed.session = EutilsSession(args.rate)
+            requests = len(server.requests)
+            batch_time, batch = timed(lambda: pubmed.retrieve_articles(uids))
+            batch_requests = len(server.requests) - requests
+            assert batch == single, 'batched efetch returned different articles'
+            rows.append([count, single_requests, single_time, batch_requests, batch_time, single_time / batch_time])
+    finally:
+        server.stop()
+    report(rows, ['results', 'per-UID requests', 'per-UID s', 'batch requests', 'batch s', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Kaplan-Meier fits of the plotting Lambda: the NumPy estimator behind
+fit_km_groups against lifelines' KaplanMeierFitter, per group, for cohorts
+of 10k to 1M patients. The estimates are checked to match before timing.
+Durations are whole days unless --continuous is given.
+
+    python benchmarks/km_estimates.py [--sizes 10000 100000 1000000] [--groups 2] [--continuous]
+"""
+import argparse
+
+import numpy as np
+
+from common import best_of, report, use_lambda
+
+use_lambda('scientific-plots-with-lifelines')
+import app  # noqa: E402
+
+
+def cohort(size, groups, rng, continuous=False):
+    # Whole days by default, so the event tables have ties like the clinical data
+    rounding = (lambda durations: durations) if continuous else np.round
+    return {
+        f'group_{i + 1}': (rounding(rng.exponential(365, size // groups)), rng.integers(0, 2, size // groups))
+        for i in range(groups)
+    }
+
+
+def fit(engine, groups):
+    app.KM_ENGINE = engine
+    return app.fit_km_groups(groups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--groups', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--continuous', action='store_true', help='distinct durations instead of whole days')
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for size in args.sizes:
+        groups = cohort(size, args.groups, rng, args.continuous)
+        numpy_time, frames = best_of(lambda: fit('numpy', groups), args.repeat)
+        lifelines_time, expected = best_of(lambda: fit('lifelines', groups), args.repeat)
+        for name in groups:
+            np.testing.assert_allclose(frames[name].to_numpy(), expected[name].to_numpy(), rtol=1e-9, atol=1e-12)
+        rows.append([size, args.groups, numpy_time * 1000, lifelines_time * 1000, lifelines_time / numpy_time])
+    report(rows, ['patients', 'groups', 'numpy ms', 'lifelines ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
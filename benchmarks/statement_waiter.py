@@ -0,0 +1,120 @@
+"""
+The adaptive StatementWaiter against the fixed 5 second polling loop it
+replaced, for Redshift Data API statements of different durations. A fake
+client finishes each statement after a set time on a simulated clock, so
+minutes of polling run instantly. Reported are the time from the end of
+the statement until the caller sees it and the describe_statement calls,
+first per statement duration and then as the p50/p99 wall time, from
+submission until the caller sees the result, over a log-normal mix of
+statement durations.
+
+    python benchmarks/statement_waiter.py [--durations 0.05 0.2 1 3 10 30 120]
+        [--statements 1000] [--median 1.0] [--sigma 1.5]
+"""
+import argparse
+import contextlib
+import io
+import math
+import random
+
+from common import report, use_lambda
+
+use_lambda('querydatabaselambda')
+import redshift_data  # noqa: E402
+from redshift_data import StatementWaiter  # noqa: E402
+
+
+class Clock:
+    """Simulated time module: sleep advances the clock instead of blocking."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeDataClient:
+    """Statements that finish ``duration`` seconds after they start, on ``clock``."""
+
+    def __init__(self, clock, duration):
+        self.clock = clock
+        self.finish = clock.now + duration
+        self.describe_calls = 0
+
+    def describe_statement(self, Id):
+        self.describe_calls += 1
+        return {'Id': Id, 'Status': 'FINISHED' if self.clock.now >= self.finish else 'STARTED'}
+
+    def cancel_statement(self, Id):
+        pass
+
+
+def fixed_polling(client, clock, statement_id):
+    """The loop get_schema and query_redshift used before the waiter."""
+    while True:
+        response = client.describe_statement(Id=statement_id)
+        if response['Status'] in ('FINISHED', 'FAILED', 'CANCELLED'):
+            return response
+        clock.sleep(5)
+
+
+def fixed_wait(client, clock):
+    return fixed_polling(client, clock, 'q')
+
+
+def adaptive_wait(client, clock):
+    return StatementWaiter(client).wait('q')
+
+
+def measure(duration, wait):
+    clock = Clock()
+    redshift_data.time = clock
+    client = FakeDataClient(clock, duration)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert wait(client, clock)['Status'] == 'FINISHED'
+    return clock.now - duration, client.describe_calls
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values."""
+    values = sorted(values)
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', type=float, nargs='+', default=[0.05, 0.2, 1, 3, 10, 30, 120])
+    parser.add_argument('--statements', type=int, default=1000, help='statements in the mixed workload')
+    parser.add_argument('--median', type=float, default=1.0, help='median statement duration, seconds')
+    parser.add_argument('--sigma', type=float, default=1.5, help='log-normal shape of the durations')
+    args = parser.parse_args()
+
+    rows = []
+    for duration in args.durations:
+        fixed_delay, fixed_calls = measure(duration, fixed_wait)
+        waiter_delay, waiter_calls = measure(duration, adaptive_wait)
+        rows.append([duration, fixed_delay, fixed_calls, waiter_delay, waiter_calls])
+    report(rows, ['statement s', 'fixed delay s', 'fixed calls', 'waiter delay s', 'waiter calls'])
+
+    generator = random.Random(0)
+    durations = [generator.lognormvariate(math.log(args.median), args.sigma) for _ in range(args.statements)]
+    rows = []
+    for name, wait in (('fixed 5 s', fixed_wait), ('waiter', adaptive_wait)):
+        measured = [measure(duration, wait) for duration in durations]
+        walls = [duration + delay for duration, (delay, _) in zip(durations, measured)]
+        delays = [delay for delay, _ in measured]
+        calls = sum(calls for _, calls in measured) / len(measured)
+        rows.append([name, percentile(walls, 50), percentile(walls, 99),
+                     percentile(delays, 50), percentile(delays, 99), calls])
+    print()
+    print(f'{args.statements} statements, median {args.median:g} s, p50 {percentile(durations, 50):.4g} s, '
+          f'p99 {percentile(durations, 99):.4g} s')
+    report(rows, ['polling', 'p50 wall s', 'p99 wall s', 'p50 delay s', 'p99 delay s', 'calls/statement'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Grouping survival data by biomarker value: the vectorized
+group_survival_data and group_survival_data_multi against the per-patient
+loop they replaced, on inline list parameters as the agent sends them.
+Each run includes parsing the parameters and serializing the groups.
+The results must be the same.
+
+    python benchmarks/survival_grouping.py [--patients 1000 10000 100000 1000000]
+"""
+import argparse
+import ast
+import bisect
+import json
+
+import numpy as np
+
+from common import best_of, report, use_lambda
+
+use_lambda('survivaldataprocessinglambda')
+from columnar_arrays import parse_inline  # noqa: E402
+from survivaldataprocessinglambda import complete_cases, group_survival_data, group_survival_data_multi  # noqa: E402
+
+
+def loop_grouping(biomarker, survival_duration, survival_status, threshold):
+    """The previous handler's parsing and loop, without its per-value prints."""
+    biomarker = ast.literal_eval(biomarker)
+    survival_duration = ast.literal_eval(survival_duration)
+    survival_status = ast.literal_eval(survival_status)
+    groups = {"baseline": {"durations": [], "events": []}, "condition": {"durations": [], "events": []}}
+    for i, value in enumerate(biomarker):
+        group = groups["baseline" if float(value) <= float(threshold) else "condition"]
+        group["durations"].append(survival_duration[i])
+        group["events"].append(survival_status[i])
+    return json.dumps(groups)
+
+
+def loop_grouping_multi(biomarker, survival_duration, survival_status, thresholds):
+    """The same loop with several cut points, one bisect per patient."""
+    biomarker = ast.literal_eval(biomarker)
+    survival_duration = ast.literal_eval(survival_duration)
+    survival_status = ast.literal_eval(survival_status)
+    groups = [{"durations": [], "events": []} for _ in range(len(thresholds) + 1)]
+    for i, value in enumerate(biomarker):
+        group = groups[bisect.bisect_left(thresholds, float(value))]
+        group["durations"].append(survival_duration[i])
+        group["events"].append(survival_status[i])
+    return json.dumps(groups)
+
+
+def vectorized(parameters, function, **options):
+    arrays = complete_cases(*(parse_inline(value) for value in parameters))
+    return function(*arrays, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for count in args.patients:
+        parameters = [
+            json.dumps(np.round(rng.lognormal(2, 1, count), 3).tolist()),
+            json.dumps(np.round(rng.exponential(3, count), 2).tolist()),
+            json.dumps(rng.integers(0, 2, count).tolist()),
+        ]
+        threshold = float(np.median(json.loads(parameters[0])))
+        loop_time, expected = best_of(lambda: loop_grouping(*parameters, threshold), args.repeat)
+        numpy_time, grouped = best_of(
+            lambda: vectorized(parameters, group_survival_data, threshold=threshold), args.repeat
+        )
+        assert json.loads(grouped) == json.loads(expected), 'two-group results differ'
+
+        numpy_multi_time, grouped = best_of(
+            lambda: vectorized(parameters, group_survival_data_multi, groups=4), args.repeat
+        )
+        grouped = json.loads(grouped)
+        loop_multi_time, expected = best_of(
+            lambda: loop_grouping_multi(*parameters, grouped['thresholds']), args.repeat
+        )
+        # The loop keeps the input order within a group, as does the stable sort
+        assert [{'durations': g['durations'], 'events': g['events']} for g in grouped['groups']] == json.loads(expected)
+        rows.append([count, loop_time * 1000, numpy_time * 1000, loop_time / numpy_time,
+                     loop_multi_time * 1000, numpy_multi_time * 1000, loop_multi_time / numpy_multi_time])
+    report(rows, ['patients', 'loop ms', 'numpy ms', 'speedup', 'loop quartiles ms', 'numpy quartiles ms',
+                  'speedup'])
+
+
+if __name__ == '__main__':
+    main()
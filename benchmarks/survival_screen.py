@@ -0,0 +1,88 @@
+"""
+Univariate survival screening of a biomarker panel: screen_survival_panel
+against a loop of lifelines models, one per biomarker (CoxPHFitter for
+method cox, logrank_test on a median split for method logrank). The Cox
+coefficients and log-rank statistics must agree. With its default damped
+steps and precision lifelines stops early enough to leave coefficients
+near zero off by up to 1e-3 relative. The loop is timed with the
+defaults, and the check uses fits with full Newton steps to a precision of
+1e-12.
+
+    python benchmarks/survival_screen.py [--patients 200 1000] [--biomarkers 60]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from lifelines import CoxPHFitter
+from lifelines.statistics import logrank_test
+
+from common import report, use_lambda
+
+use_lambda('scientific-plots-with-lifelines')
+from app import screen_survival_panel  # noqa: E402
+
+
+def cohort(patients, biomarkers, rng):
+    X = rng.normal(size=(patients, biomarkers))
+    risk = 0.5 * X[:, 0] - 0.3 * X[:, 1]
+    data = pd.DataFrame(X, columns=[f'gene_{i}' for i in range(biomarkers)])
+    data['survival_duration'] = np.round(rng.exponential(np.exp(-risk)) * 365)
+    data['survival_status'] = (rng.random(patients) < 0.7).astype(int)
+    return data
+
+
+def lifelines_cox(data, columns, **fit_options):
+    coefs = {}
+    for column in columns:
+        model = CoxPHFitter().fit(
+            data[[column, 'survival_duration', 'survival_status']], 'survival_duration', 'survival_status',
+            fit_options=fit_options or None,
+        )
+        coefs[column] = model.params_[column]
+    return pd.Series(coefs)
+
+
+def lifelines_logrank(data, columns):
+    statistics = {}
+    for column in columns:
+        high = data[column] > data[column].median()
+        statistics[column] = logrank_test(
+            data.loc[high, 'survival_duration'], data.loc[~high, 'survival_duration'],
+            data.loc[high, 'survival_status'], data.loc[~high, 'survival_status'],
+        ).test_statistic
+    return pd.Series(statistics)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, nargs='+', default=[200, 1000])
+    parser.add_argument('--biomarkers', type=int, default=60)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for patients in args.patients:
+        data = cohort(patients, args.biomarkers, rng)
+        columns = [column for column in data.columns if column.startswith('gene_')]
+        for method, reference, field in (('cox', lifelines_cox, 'coef'), ('logrank', lifelines_logrank, 'test_statistic')):
+            screen_time, summary = timed(lambda: screen_survival_panel(data, method=method))
+            loop_time, expected = timed(lambda: reference(data, columns))
+            if method == 'cox':
+                expected = reference(data, columns, precision=1e-12, step_size=1.0)
+            np.testing.assert_allclose(summary[field].loc[columns].to_numpy(), expected.loc[columns].to_numpy(),
+                                       rtol=1e-6, atol=1e-7, err_msg=method)
+            rows.append([patients, args.biomarkers, method, loop_time * 1000, screen_time * 1000,
+                         loop_time / screen_time])
+    report(rows, ['patients', 'biomarkers', 'method', 'lifelines loop ms', 'screen ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+The fast mode of the bundled xmltodict against its default SAX handler, on
+efetch payloads built from the PubMed fixture. Fast mode must build the
+same document, and with the Label whitelist used by the PubMed Lambda the
+same article records.
+
+    python benchmarks/xmltodict_fast.py [--articles 10 100 1000]
+"""
+import argparse
+import os
+
+from common import best_of, efetch_payload, report, use_lambda
+
+use_lambda('pubmed-lambda-function')
+os.environ.setdefault('ARTICLE_CACHE_PATH', '')
+import xmltodict  # noqa: E402
+from PubMed import PubMed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    pubmed = PubMed()
+
+    rows = []
+    for count in args.articles:
+        data = efetch_payload(count)
+        default_time, default = best_of(lambda: xmltodict.parse(data), args.repeat)
+        fast_time, fast = best_of(lambda: xmltodict.parse(data, fast=True), args.repeat)
+        label_time, labels_only = best_of(
+            lambda: xmltodict.parse(data, fast=True, attr_whitelist=('Label',)), args.repeat
+        )
+        assert fast == default, 'fast mode built a different document'
+        assert pubmed._parse_articles(labels_only) == pubmed._parse_articles(default), 'article records differ'
+        rows.append([count, len(data) // 1024, default_time * 1000, fast_time * 1000, label_time * 1000,
+                     default_time / label_time])
+    report(rows, ['articles', 'KiB', 'default ms', 'fast ms', 'fast+Label ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
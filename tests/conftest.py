@@ -0,0 +1,15 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The Lambda handlers import their sibling modules by name, as they are
+# packaged flat; the build also copies the shared modules next to them.
+for directory in (
+    'shared',
+    'querydatabaselambda',
+    'pubmed-lambda-function',
+    'survivaldataprocessinglambda',
+    'scientific-plots-with-lifelines',
+):
+    sys.path.insert(0, os.path.join(ROOT, 'ActionGroups', directory))
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+# Keep the article cache of the PubMed client in memory during the tests
+os.environ.setdefault('ARTICLE_CACHE_PATH', '')
+
+from eutils_stub import StubEutils
+
+
+@pytest.fixture
+def eutils_server():
+    server = StubEutils().start()
+    yield server
+    server.stop()
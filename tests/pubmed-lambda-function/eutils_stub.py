@@ -0,0 +1,106 @@
+"""
+Local stand-in for the esearch and efetch endpoints of NCBI E-utilities.
+
+Every request is recorded with its arrival time and parameters. Scripted failures are
+served before normal responses, e.g. ``server.fail(429, retry_after=1)``.
+``latency`` delays every response, like the round trip to NCBI.
+"""
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+
+
+def article_xml(uid, length=1):
+    """An efetch record; ``length`` repeats the title and abstract text to make it larger."""
+    results = f"Patients' GDF15 levels (\u2265 1.5\u00d7 median) in article {uid} were higher. " * length
+    return (
+        f'<PubmedArticle><MedlineCitation><PMID Version="1">{uid}</PMID><Article>'
+        f'<ArticleTitle>{"Article %s on gdf15 expression in non-small cell lung cancer " % uid * length}</ArticleTitle><Abstract>'
+        f'<AbstractText Label="RESULTS">{results}</AbstractText>'
+        f'<AbstractText Label="CONCLUSIONS">Conclusion of article {uid}.</AbstractText></Abstract>'
+        f'<ArticleDate><Year>2021</Year><Month>03</Month><Day>04</Day></ArticleDate>'
+        f'</Article></MedlineCitation></PubmedArticle>'
+    )
+
+
+class StubEutils:
+    def __init__(self, total_results=500, article_length=1, latency=0.0):
+        self.total_results = total_results
+        self.article_length = article_length
+        self.latency = latency
+        self.requests = []
+        self.params = []
+        self.failures = []
+        self.lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail(self, status, retry_after=None, times=1):
+        """Answer the next ``times`` requests with ``status``."""
+        with self.lock:
+            self.failures.extend([(status, retry_after)] * times)
+
+    def request_times(self, endpoint=None):
+        return [at for at, path in self.requests if endpoint is None or endpoint in path]
+
+    def request_params(self, endpoint=None):
+        """Query parameters of the recorded requests, one value per name."""
+        return [
+            {name: values[0] for name, values in query.items()}
+            for path, query in self.params
+            if endpoint is None or endpoint in path
+        ]
+
+    def _respond(self, path, query):
+        with self.lock:
+            self.requests.append((time.monotonic(), path))
+            self.params.append((path, query))
+            if self.failures:
+                status, retry_after = self.failures.pop(0)
+                headers = {} if retry_after is None else {'Retry-After': str(retry_after)}
+                return status, headers, b'stub failure'
+        time.sleep(self.latency)
+        if 'esearch' in path:
+            start = int(query.get('retstart', ['0'])[0])
+            count = int(query.get('retmax', ['5'])[0])
+            uids = [str(10000 + i) for i in range(start, min(start + count, self.total_results))]
+            body = {'esearchresult': {'count': str(self.total_results), 'idlist': uids}}
+            return 200, {}, json.dumps(body).encode()
+        uids = query['id'][0].split(',')
+        xml = '<?xml version="1.0"?><PubmedArticleSet>' + ''.join(article_xml(uid, self.article_length) for uid in uids) + '</PubmedArticleSet>'
+        return 200, {}, xml.encode()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                status, headers, body = stub._respond(url.path, urllib.parse.parse_qs(url.query))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
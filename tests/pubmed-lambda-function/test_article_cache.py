@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import article_cache
+from article_cache import ArticleCache, SQLiteArticleStore
+from PubMed import PubMed
+from eutils import EutilsSession
+
+
+def article(uid, length=100):
+    return {'uid': uid, 'Title': f'Article {uid}', 'Published': '2021-03-04', 'Summary': 'x' * length}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(article_cache.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def pubmed(eutils_server):
+    client = PubMed()
+    client.base_url_esearch = eutils_server.base_url + 'esearch.fcgi?'
+    client.base_url_efetch = eutils_server.base_url + 'efetch.fcgi?'
+    client.session = EutilsSession(100)
+    return client
+
+
+def test_article_hits_and_misses():
+    cache = ArticleCache()
+    cache.put_articles([article('1'), article('2')])
+    assert cache.get_articles(['1', '3', '2']) == {'1': article('1'), '2': article('2')}
+    assert cache.stats['hits'] == 2
+    assert cache.stats['misses'] == 1
+
+
+def test_least_recently_used_articles_are_evicted_by_size():
+    size = len(json.dumps(article('1')))
+    cache = ArticleCache(max_bytes=3 * size)
+    cache.put_articles([article('1'), article('2'), article('3')])
+    cache.get_articles(['1'])
+    cache.put_articles([article('4')])
+    assert set(cache.get_articles(['1', '2', '3', '4'])) == {'1', '3', '4'}
+    assert cache.size <= cache.max_bytes
+    # Articles larger than the whole cache are not kept
+    cache.put_articles([article('5', length=4 * size)])
+    assert cache.get_articles(['5']) == {}
+    assert set(cache.get_articles(['1', '3', '4'])) == {'1', '3', '4'}
+
+
+def test_articles_and_queries_expire(clock):
+    cache = ArticleCache(ttl=100, query_ttl=10)
+    cache.put_articles([article('1')])
+    cache.put_query('GDF15  lung cancer', 5, ['1', '2'])
+    assert cache.get_query('gdf15 lung cancer', 5) == ['1', '2']
+    assert cache.get_query('gdf15 lung cancer', 20) is None
+    clock[0] += 10
+    assert cache.get_query('gdf15 lung cancer', 5) is None
+    assert cache.get_articles(['1']) == {'1': article('1')}
+    clock[0] += 90
+    assert cache.get_articles(['1']) == {}
+    assert cache.stats['query_hits'] == 1
+    assert cache.stats['query_misses'] == 2
+
+
+def test_query_cache_is_bounded():
+    cache = ArticleCache(max_queries=2)
+    for query in ('a', 'b', 'c'):
+        cache.put_query(query, 5, [query])
+    assert cache.get_query('a', 5) is None
+    assert cache.get_query('c', 5) == ['c']
+
+
+def test_sqlite_store_is_shared_by_later_containers(tmp_path, clock):
+    path = str(tmp_path / 'articles.sqlite3')
+    cache = ArticleCache(ttl=100, query_ttl=10, store=SQLiteArticleStore(path))
+    cache.put_articles([article('1'), article('2')])
+    cache.put_query('gdf15', 5, ['1', '2'])
+
+    warm = ArticleCache(ttl=100, query_ttl=10, store=SQLiteArticleStore(path))
+    assert warm.get_articles(['1', '2']) == {'1': article('1'), '2': article('2')}
+    assert warm.stats['store_hits'] == 2
+    assert warm.get_query('gdf15', 5) == ['1', '2']
+    assert [stored['uid'] for stored in warm.stored_articles()] == ['1', '2']
+
+    # Expired rows are pruned when the next container starts
+    clock[0] += 101
+    later = ArticleCache(ttl=100, query_ttl=10, store=SQLiteArticleStore(path))
+    assert later.get_articles(['1']) == {}
+    assert later.get_query('gdf15', 5) is None
+    assert list(later.stored_articles()) == []
+
+
+def test_cache_hits_skip_the_network_and_parsing(eutils_server, pubmed, monkeypatch):
+    first = list(pubmed.search('gdf15 lung cancer', max_results=3))
+    assert [doc['uid'] for doc in first] == ['10000', '10001', '10002']
+    requests = len(eutils_server.requests)
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('cached articles must not be parsed again')
+
+    monkeypatch.setattr(pubmed, 'retrieve_articles', no_parsing)
+    assert list(pubmed.search('GDF15  lung cancer', max_results=3)) == first
+    assert len(eutils_server.requests) == requests
+    # A new query with known articles only costs the esearch request
+    assert [doc['uid'] for doc in pubmed.search('gdf15 survival', max_results=2)] == ['10000', '10001']
+    assert len(eutils_server.request_times('esearch')) == 2
+    assert len(eutils_server.request_times('efetch')) == 1
+    [doc] = pubmed.get_articles(['10001'])
+    assert doc['Link'] == 'https://pubmed.ncbi.nlm.nih.gov/10001'
+    assert len(eutils_server.request_times('efetch')) == 1
@@ -0,0 +1,16 @@
+import pytest
+
+from PubMed import PubMed
+from eutils import EutilsSession
+
+
+@pytest.mark.parametrize('max_results', [5, 20, 100])
+def test_search_fetches_all_hits_with_one_efetch(eutils_server, max_results):
+    pubmed = PubMed()
+    pubmed.base_url_esearch = eutils_server.base_url + 'esearch.fcgi?'
+    pubmed.base_url_efetch = eutils_server.base_url + 'efetch.fcgi?'
+    pubmed.session = EutilsSession(100)
+    articles = list(pubmed.search(f'gdf15 batch {max_results}', max_results))
+    assert [article['uid'] for article in articles] == [str(10000 + i) for i in range(max_results)]
+    assert len(eutils_server.request_times('esearch')) == 1
+    assert len(eutils_server.request_times('efetch')) == 1
@@ -0,0 +1,28 @@
+import urllib.error
+
+import pytest
+
+from eutils import EutilsSession
+
+
+def max_in_window(times, window=1.0):
+    """Largest number of requests started within any half-open window of ``window`` seconds."""
+    return max(sum(1 for other in times if start <= other < start + window) for start in times)
+
+
+@pytest.mark.parametrize('rate', [3, 10])
+def test_requests_per_second_never_exceed_rate(eutils_server, rate):
+    session = EutilsSession(rate)
+    for _ in range(rate * 2 + 1):
+        session.get(eutils_server.base_url + 'esearch.fcgi?term=gdf15&retmax=1')
+    # Slightly under a second, as the first request also pays for the connection setup
+    assert max_in_window(eutils_server.request_times(), window=0.95) <= rate
+
+
+def test_http_errors_are_raised_with_headers(eutils_server):
+    eutils_server.fail(429, retry_after=2)
+    session = EutilsSession(10)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        session.get(eutils_server.base_url + 'esearch.fcgi?term=gdf15')
+    assert error.value.code == 429
+    assert error.value.headers['Retry-After'] == '2'
@@ -0,0 +1,101 @@
+import pytest
+
+import lambda_function
+from local_index import LocalIndex, tokenize
+from PubMed import PubMed
+from eutils import EutilsSession
+from test_retry_policy import LambdaContext
+
+ARTICLES = [dict(article, Published='2021-03-04') for article in [
+    {'uid': '1', 'Title': 'GDF15 belongs to metagene cluster 19', 'Summary': 'GDF15 expression clusters with EGFR.'},
+    {'uid': '2', 'Title': 'Smoking and lung cancer', 'Summary': 'Pack years predict survival in NSCLC.'},
+    {'uid': '3', 'Title': 'Metagene clusters in lung adenocarcinoma', 'Summary': 'Cluster 19 is linked to survival.'},
+    {'uid': '4', 'Title': 'EGFR mutations', 'Summary': 'EGFR mutations in never smokers with lung cancer.'},
+]]
+
+
+@pytest.fixture
+def index():
+    index = LocalIndex()
+    index.add(ARTICLES)
+    return index
+
+
+@pytest.fixture
+def pubmed(eutils_server, monkeypatch):
+    client = PubMed()
+    client.base_url_esearch = eutils_server.base_url + 'esearch.fcgi?'
+    client.base_url_efetch = eutils_server.base_url + 'efetch.fcgi?'
+    client.session = EutilsSession(100)
+    monkeypatch.setattr(lambda_function, 'pubmed', client)
+    return client
+
+
+def test_tokenize():
+    assert tokenize('According to literature, what metagene clusters does GDF15 belong to?') == [
+        'metagene', 'cluster', 'gdf15', 'belong',
+    ]
+    assert tokenize('Smokers, stress and EGFR') == ['smoker', 'stress', 'egfr']
+
+
+def test_bm25_ranking(index):
+    hits = index.search('what metagene cluster does gdf15 belong to')
+    assert [article['uid'] for _, article in hits] == ['1']
+    scores = [score for score, _ in index.search('metagene cluster', limit=10)]
+    assert scores == sorted(scores, reverse=True)
+    assert [article['uid'] for _, article in index.search('metagene cluster', limit=10)] == ['3', '1']
+
+
+def test_coverage_threshold(index):
+    # "egfr lung cancer" is fully covered by 4, partly by 1 and 2
+    assert [article['uid'] for _, article in index.search('egfr lung cancer', limit=10)] == ['4', '2']
+    assert [article['uid'] for _, article in index.search('egfr lung cancer', limit=10, min_coverage=1.0)] == ['4']
+    assert len(index.search('egfr lung cancer', limit=10, min_coverage=0)) == 4
+    assert index.search('gdf15 prognosis in melanoma') == []
+    assert index.search('what does the literature show') == []
+
+
+def test_oldest_documents_are_dropped(index):
+    small = LocalIndex(max_documents=2)
+    small.add(ARTICLES)
+    small.add(ARTICLES[2:])
+    assert len(small) == 2
+    assert small.search('gdf15 metagene') == []
+    assert [article['uid'] for _, article in small.search('egfr mutation')] == ['4']
+    assert 'gdf15' not in small.postings
+
+
+def test_search_local_answers_from_fetched_articles(eutils_server, pubmed):
+    pubmed.index = LocalIndex()
+    assert pubmed.search_local('gdf15 lung cancer', max_results=3)['source'] == 'pubmed'
+    requests = len(eutils_server.requests)
+    # The stub articles are all about gdf15 in non-small cell lung cancer
+    result = pubmed.search_local('gdf15 expression in lung cancer', max_results=2)
+    assert result['source'] == 'local index'
+    assert len(result['results']) == 2
+    assert len(eutils_server.requests) == requests
+
+
+def test_search_local_falls_back_to_pubmed(eutils_server, pubmed):
+    pubmed.index = LocalIndex()
+    pubmed.index.add(ARTICLES)
+    assert pubmed.search_local('gdf15 metagene cluster')['source'] == 'local index'
+    assert not eutils_server.requests
+    assert pubmed.search_local('osimertinib resistance')['source'] == 'pubmed'
+    assert pubmed.search_local('gdf15 metagene cluster', fresh=True)['source'] == 'pubmed'
+    assert len(eutils_server.request_times('esearch')) == 2
+
+
+def test_search_local_api_path(eutils_server, pubmed):
+    pubmed.index = LocalIndex()
+    pubmed.index.add(ARTICLES)
+    event = {
+        'actionGroup': 'pubmed',
+        'apiPath': '/search-local',
+        'httpMethod': 'GET',
+        'parameters': [{'name': 'query', 'value': 'gdf15 metagene cluster'}],
+    }
+    response = lambda_function.lambda_handler(event, LambdaContext(30))
+    assert response['response']['httpStatusCode'] == 200
+    assert 'local index' in response['response']['responseBody']['application/json']['body']
+    assert not eutils_server.requests
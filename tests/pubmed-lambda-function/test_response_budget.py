@@ -0,0 +1,102 @@
+import pytest
+
+import lambda_function
+from PubMed import PubMed
+from eutils import EutilsSession
+from eutils_stub import StubEutils
+from response_budget import budget_summaries, limit_body, serialized_size
+from test_retry_policy import LambdaContext
+
+
+def event(api_path, **parameters):
+    return {
+        'actionGroup': 'pubmed',
+        'apiPath': api_path,
+        'httpMethod': 'GET',
+        'parameters': [{'name': name, 'value': value} for name, value in parameters.items()],
+    }
+
+
+def response_text(response):
+    return response['response']['responseBody']['application/json']['body']
+
+
+@pytest.fixture
+def pubmed(monkeypatch):
+    # Long, non-ASCII abstracts with quotes, like those of the 137 result query
+    server = StubEutils(article_length=8).start()
+    client = PubMed()
+    client.base_url_esearch = server.base_url + 'esearch.fcgi?'
+    client.base_url_efetch = server.base_url + 'efetch.fcgi?'
+    client.session = EutilsSession(100)
+    monkeypatch.setattr(lambda_function, 'pubmed', client)
+    yield client
+    server.stop()
+
+
+def make_doc(i, summary_length=3000):
+    return {
+        'Published': '2021-03-04',
+        'Link': f'https://pubmed.ncbi.nlm.nih.gov/{10000 + i}/',
+        'Title': f'Article {i} on “gdf15” expression ' * 5,
+        'Summary': ("RESULTS: Patients' levels ≥ 1.5× the median.\n" * 100)[:summary_length],
+    }
+
+
+@pytest.mark.parametrize('count', [1, 20, 137, 200])
+def test_budget_covers_the_whole_serialized_list(count):
+    docs = [make_doc(i) for i in range(count)]
+    budgeted = budget_summaries(docs, 20000)
+    assert serialized_size(budgeted) <= 20000
+    assert budgeted
+    # Highest ranked documents are kept, in order, and marked when shortened
+    assert [doc['Link'] for doc in budgeted] == [doc['Link'] for doc in docs[: len(budgeted)]]
+    assert budgeted == docs or all(doc['Truncated'] for doc in budgeted)
+
+
+def test_short_lists_are_returned_unchanged():
+    docs = [make_doc(i, summary_length=100) for i in range(3)]
+    assert budget_summaries(docs, 20000) == docs
+
+
+def test_limit_body_cuts_on_a_character_boundary():
+    body = '×' * 20000
+    text = limit_body(body, 1001)
+    assert len(text.encode('utf-8')) <= 1001
+    assert text.endswith('(response cut to the size limit)')
+
+
+@pytest.mark.parametrize('max_results', ['137', '200'])
+def test_query_response_fits_the_agent_limit(pubmed, max_results):
+    response = lambda_function.lambda_handler(
+        event('/query-pubmed', query='gdf15 lung cancer', max_results=max_results), LambdaContext(30)
+    )
+    assert response['response']['httpStatusCode'] == 200
+    text = response_text(response)
+    assert len(text.encode('utf-8')) <= pubmed.max_response_bytes
+    assert 'response cut to the size limit' not in text
+    assert "'Truncated': True" in text
+
+
+def test_batch_articles_and_local_search_fit_the_agent_limit(pubmed):
+    pubmed.top_k_results = 100
+    response = lambda_function.lambda_handler(
+        event('/query-pubmed/batch', queries='["gdf15 lung cancer", "gdf15 survival", "egfr smoking"]'),
+        LambdaContext(30),
+    )
+    assert response['response']['httpStatusCode'] == 200
+    text = response_text(response)
+    assert len(text.encode('utf-8')) <= pubmed.max_response_bytes
+    assert 'response cut to the size limit' not in text
+    assert text.count("'query'") == 3
+
+    pubmed.max_response_bytes = 5000
+    response = lambda_function.lambda_handler(
+        event('/pubmed-articles', pmids=str([10000 + i for i in range(20)])), LambdaContext(30)
+    )
+    text = response_text(response)
+    assert len(text.encode('utf-8')) <= pubmed.max_response_bytes
+    assert 'pubmed.ncbi.nlm.nih.gov/10000' in text
+
+    result = pubmed.search_local('gdf15 lung cancer', max_results=100, fresh=True)
+    assert serialized_size(result) <= pubmed.max_response_bytes
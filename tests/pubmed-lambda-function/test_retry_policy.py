@@ -0,0 +1,84 @@
+import time
+import urllib.error
+
+import pytest
+
+import lambda_function
+from PubMed import PubMed
+from eutils import EutilsSession, RetryPolicy
+
+
+class LambdaContext:
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def query_event(query):
+    return {
+        'actionGroup': 'pubmed',
+        'apiPath': '/query-pubmed',
+        'httpMethod': 'GET',
+        'parameters': [{'name': 'query', 'value': query}, {'name': 'max_results', 'value': '3'}],
+    }
+
+
+@pytest.fixture
+def pubmed(eutils_server, monkeypatch):
+    client = PubMed()
+    client.base_url_esearch = eutils_server.base_url + 'esearch.fcgi?'
+    client.base_url_efetch = eutils_server.base_url + 'efetch.fcgi?'
+    # The rate limit is covered by test_eutils_session
+    client.session = EutilsSession(100)
+    monkeypatch.setattr(lambda_function, 'pubmed', client)
+    return client
+
+
+def test_backoff_does_not_carry_over_to_warm_invocations(eutils_server, pubmed):
+    eutils_server.fail(429, retry_after=0, times=3)
+    latencies = []
+    for i in range(6):
+        start = time.monotonic()
+        response = lambda_function.lambda_handler(query_event(f'gdf15 metagene {i}'), LambdaContext(30))
+        latencies.append(time.monotonic() - start)
+        assert response['response']['httpStatusCode'] == 200
+        assert 'pubmed.ncbi.nlm.nih.gov/10000' in response['response']['responseBody']['application/json']['body']
+    # Only the first invocation retried; the following ones take no backoff at all
+    assert max(latencies[1:]) < 0.5
+    assert max(latencies[1:]) <= max(latencies[0], 0.5)
+
+
+def test_retry_after_is_the_minimum_wait(eutils_server):
+    eutils_server.fail(429, retry_after=1)
+    session = EutilsSession(100)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+    body = policy.call(lambda: session.get(eutils_server.base_url + 'esearch.fcgi?term=gdf15&retmax=1'))
+    assert b'idlist' in body
+    first, second = eutils_server.request_times()
+    assert second - first >= 1.0
+
+
+def test_gives_up_at_the_deadline(eutils_server):
+    eutils_server.fail(503, times=1000)
+    session = EutilsSession(100)
+    policy = RetryPolicy(max_attempts=1000, base_delay=0.05, max_delay=0.2)
+    start = time.monotonic()
+    deadline = start + 1.0
+    with pytest.raises(urllib.error.HTTPError) as error:
+        policy.call(lambda: session.get(eutils_server.base_url + 'esearch.fcgi?term=gdf15'), deadline=deadline)
+    assert error.value.code == 503
+    assert time.monotonic() <= deadline + 0.1
+    assert len(eutils_server.request_times()) > 1
+    assert max(eutils_server.request_times()) < deadline
+
+
+def test_search_stops_within_the_time_budget(eutils_server, pubmed):
+    eutils_server.fail(503, retry_after=0.3, times=1000)
+    # More than PubMed.page_time_reserve, so that the search is started
+    pubmed.set_time_budget(2.5)
+    start = time.monotonic()
+    result = pubmed.run('gdf15')
+    assert result.startswith('PubMed exception')
+    assert time.monotonic() - start <= 2.6
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from PubMed import PubMed
+from eutils import EutilsSession
+from eutils_stub import StubEutils
+
+
+def client_for(server):
+    client = PubMed()
+    client.base_url_esearch = server.base_url + 'esearch.fcgi?'
+    client.base_url_efetch = server.base_url + 'efetch.fcgi?'
+    client.session = EutilsSession(100)
+    client.max_batch_size = 20
+    return client
+
+
+@pytest.fixture
+def pubmed(eutils_server):
+    return client_for(eutils_server)
+
+
+def uids(articles):
+    return [article['uid'] for article in articles]
+
+
+def test_pages_with_retstart_and_retmax(eutils_server, pubmed):
+    assert uids(pubmed.search('gdf15 lung cancer', max_results=50)) == [str(10000 + i) for i in range(50)]
+    pages = eutils_server.request_params('esearch')
+    assert [(page['retstart'], page['retmax']) for page in pages] == [('0', '20'), ('20', '20'), ('40', '10')]
+    assert {page['term'] for page in pages} == {'gdf15 lung cancer'}
+    assert len(eutils_server.request_times('efetch')) == 3
+
+
+def test_stops_after_the_last_page():
+    server = StubEutils(total_results=25).start()
+    try:
+        assert len(list(client_for(server).search('gdf15', max_results=100))) == 25
+        assert [page['retstart'] for page in server.request_params('esearch')] == ['0', '20']
+    finally:
+        server.stop()
+
+
+def test_results_are_capped(eutils_server, pubmed):
+    pubmed.max_results_limit = 30
+    assert len(list(pubmed.search('gdf15', max_results=500))) == 30
+    assert len(list(pubmed.search('egfr'))) == pubmed.top_k_results
+
+
+def test_sort_and_date_range(eutils_server, pubmed):
+    list(pubmed.search('gdf15', max_results=1, sort='pub_date', min_date='2020/01'))
+    list(pubmed.search('egfr', max_results=1, max_date='2023/12/31'))
+    sorted_page, dated_page = eutils_server.request_params('esearch')
+    assert sorted_page['sort'] == 'pub_date'
+    assert (sorted_page['datetype'], sorted_page['mindate'], sorted_page['maxdate']) == ('pdat', '2020/01', '3000')
+    assert dated_page['sort'] == 'relevance'
+    assert (dated_page['mindate'], dated_page['maxdate']) == ('1800', '2023/12/31')
+
+
+@pytest.mark.parametrize('options', [
+    {'sort': 'date'},
+    {'min_date': '2020-01-01'},
+    {'min_date': '2020/13'},
+    {'max_date': '2020/02/32'},
+    {'max_date': '20201'},
+])
+def test_invalid_options_are_rejected(eutils_server, pubmed, options):
+    with pytest.raises(ValueError):
+        list(pubmed.search('gdf15', **options))
+    assert pubmed.run('gdf15', **options).startswith('PubMed exception: ')
+    assert not eutils_server.requests
+
+
+def test_stops_at_the_deadline(eutils_server, pubmed):
+    results = pubmed.search('gdf15', max_results=100)
+    first_page = [next(results) for _ in range(20)]
+    # Too little time left to start another page
+    pubmed.deadline = time.monotonic() + pubmed.page_time_reserve / 2
+    assert list(results) == []
+    assert uids(first_page) == [str(10000 + i) for i in range(20)]
+    assert len(eutils_server.request_times('esearch')) == 1
+
+
+def test_no_page_is_started_without_time(eutils_server, pubmed):
+    pubmed.set_time_budget(pubmed.page_time_reserve / 2)
+    assert list(pubmed.search('gdf15', max_results=10)) == []
+    assert pubmed.run('gdf15') == 'No good PubMed Result was found'
+    assert not eutils_server.requests
@@ -0,0 +1,58 @@
+import io
+import os
+
+import xmltodict
+from article_parser import iter_articles
+from PubMed import PubMed
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'benchmarks', 'fixtures', 'efetch_pubmed_articles.xml'
+)
+
+
+def load_fixture():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def test_fast_mode_builds_the_default_document():
+    data = load_fixture()
+    assert xmltodict.parse(data, fast=True) == xmltodict.parse(data)
+
+
+def test_label_whitelist_keeps_the_article_records():
+    data = load_fixture()
+    pubmed = PubMed()
+    records = pubmed._parse_articles(xmltodict.parse(data, fast=True, attr_whitelist=('Label',)))
+    assert records == pubmed._parse_articles(xmltodict.parse(data))
+    assert len(records) == 10
+    assert records[0]['Summary'].startswith('BACKGROUND: ')
+
+
+def test_streaming_parser_gives_the_xmltodict_records():
+    data = load_fixture()
+    records = PubMed()._parse_articles(xmltodict.parse(data))
+    assert list(iter_articles(io.BytesIO(data))) == records
+
+
+def test_streaming_parser_reads_only_the_article_fields():
+    data = b"""<?xml version="1.0"?><PubmedArticleSet>
+    <PubmedArticle><MedlineCitation><PMID Version="1"> 111 </PMID><Article>
+    <ArticleTitle>Role of <i>GDF15</i> in NSCLC</ArticleTitle>
+    <Abstract><AbstractText>First part.</AbstractText><AbstractText>Second <sup>2</sup> part.</AbstractText>
+    <CopyrightInformation> (c) X </CopyrightInformation></Abstract>
+    <ArticleDate><Year>2020</Year><Month>01</Month><Day>02</Day></ArticleDate></Article>
+    <OtherAbstract><AbstractText>Other</AbstractText></OtherAbstract>
+    <CommentsCorrectionsList><CommentsCorrections><PMID>999</PMID></CommentsCorrections></CommentsCorrectionsList>
+    </MedlineCitation></PubmedArticle>
+    <PubmedBookArticle><BookDocument><PMID>222</PMID><ArticleTitle>Book</ArticleTitle>
+    <Abstract><AbstractText Label="RESULTS">R</AbstractText></Abstract></BookDocument></PubmedBookArticle>
+    <PubmedArticle><MedlineCitation><PMID>333</PMID></MedlineCitation></PubmedArticle>
+    </PubmedArticleSet>"""
+    assert list(iter_articles(io.BytesIO(data))) == [
+        {'uid': '111', 'Title': 'Role of GDF15 in NSCLC', 'Published': '2020-01-02',
+         'Copyright Information': '(c) X', 'Summary': 'First part.\nSecond 2 part.'},
+        {'uid': '222', 'Title': 'Book', 'Published': '--', 'Copyright Information': '', 'Summary': 'RESULTS: R'},
+        {'uid': '333', 'Title': '', 'Published': '--', 'Copyright Information': '',
+         'Summary': 'No abstract available'},
+    ]
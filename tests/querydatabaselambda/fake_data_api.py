@@ -0,0 +1,57 @@
+"""
+In-memory stand-in for the Redshift Data API client.
+
+Statements finish immediately. Results are looked up by the first entry
+of ``results`` whose key occurs in the SQL; a value that is an exception
+makes the statement fail, like a Data API FAILED status.
+"""
+import itertools
+
+
+def cell(value):
+    if value is None:
+        return {'isNull': True}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'longValue': value}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': value}
+
+
+class FakeDataClient:
+    def __init__(self, results=None, page_size=1000):
+        self.results = dict(results or {})
+        self.page_size = page_size
+        self.statements = {}
+        self.executed = []
+        self._ids = itertools.count(1)
+
+    def execute_statement(self, Sql, **kwargs):
+        statement_id = f'stmt-{next(self._ids)}'
+        self.executed.append(Sql)
+        self.statements[statement_id] = next(
+            (result for key, result in self.results.items() if key in Sql), ([('?column?', 'int4')], [])
+        )
+        return {'Id': statement_id}
+
+    def describe_statement(self, Id):
+        result = self.statements[Id]
+        if isinstance(result, Exception):
+            return {'Id': Id, 'Status': 'FAILED', 'Error': str(result)}
+        return {'Id': Id, 'Status': 'FINISHED'}
+
+    def cancel_statement(self, Id):
+        pass
+
+    def get_statement_result(self, Id, NextToken=None):
+        columns, rows = self.statements[Id]
+        start = int(NextToken or 0)
+        page = {
+            'ColumnMetadata': [{'name': name, 'typeName': type_name} for name, type_name in columns],
+            'Records': [[cell(value) for value in row] for row in rows[start:start + self.page_size]],
+        }
+        if start + self.page_size < len(rows):
+            page['NextToken'] = str(start + self.page_size)
+        return page
@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+
+from efficient_query import CLOSING_TAG, NO_CHANGE, EfficientQueryParser, invoke_efficient_query, stream_efficient_query
+
+SQL = 'SELECT survival_status, COUNT(*) AS count FROM lung_cancer_cases GROUP BY survival_status;'
+
+
+def feed_all(chunks):
+    parser = EfficientQueryParser()
+    done = [parser.feed(chunk) for chunk in chunks]
+    return parser, done
+
+
+def test_closing_tag_in_one_chunk():
+    parser, done = feed_all([SQL + CLOSING_TAG + '\nThis query aggregates the rows.'])
+    assert done == [True]
+    assert parser.result == SQL
+
+
+@pytest.mark.parametrize('split', range(1, len(CLOSING_TAG)))
+def test_closing_tag_split_across_chunks(split):
+    parser, done = feed_all([SQL[:20], SQL[20:] + CLOSING_TAG[:split], CLOSING_TAG[split:] + ' explanation'])
+    assert done == [False, False, True]
+    assert parser.finish() == SQL
+
+
+def test_closing_tag_one_character_at_a_time():
+    parser, done = feed_all(list(' ' + SQL + CLOSING_TAG))
+    assert done.index(True) == len(done) - 1
+    assert parser.result == SQL
+
+
+def test_no_change_sentinel():
+    parser, done = feed_all(['\nNo chan', 'ge needed', CLOSING_TAG])
+    assert done == [False, True, True]
+    assert parser.finish() == NO_CHANGE
+
+
+def test_text_after_the_result_is_ignored():
+    parser, _ = feed_all([SQL + CLOSING_TAG])
+    assert parser.feed('SELECT 1;' + CLOSING_TAG)
+    assert parser.finish() == SQL
+
+
+def test_finish_without_closing_tag():
+    # Output cut by the stop sequence or max_tokens
+    parser, done = feed_all([' ' + SQL[:30], SQL[30:] + '\n'])
+    assert done == [False, False]
+    assert parser.finish() == SQL
+
+
+class FakeStream:
+    def __init__(self, texts):
+        self.events = [self.event(text) for text in texts]
+        self.read = 0
+        self.closed = False
+
+    @staticmethod
+    def event(text):
+        payload = {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': text}}
+        return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+    def __iter__(self):
+        yield {'chunk': {'bytes': json.dumps({'type': 'message_start'}).encode('utf-8')}}
+        for event in self.events:
+            self.read += 1
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBedrock:
+    def __init__(self, texts):
+        self.texts = texts
+        self.stream = FakeStream(texts)
+
+    def invoke_model_with_response_stream(self, body, modelId):
+        return {'body': self.stream}
+
+    def invoke_model(self, body, modelId):
+        content = [{'type': 'text', 'text': ''.join(self.texts)}]
+        return {'body': io.BytesIO(json.dumps({'content': content}).encode('utf-8'))}
+
+
+def test_stream_stops_reading_after_the_closing_tag():
+    client = FakeBedrock([SQL[:40], SQL[40:] + '</efficient', 'Query>', '\nExplanation', ' of the query.'])
+    assert stream_efficient_query(client, '{}', 'model') == SQL
+    assert client.stream.read == 3
+    assert client.stream.closed
+
+
+def test_stream_without_closing_tag_reads_to_the_end():
+    client = FakeBedrock([SQL[:40], SQL[40:]])
+    assert stream_efficient_query(client, '{}', 'model') == SQL
+    assert client.stream.read == 2
+    assert client.stream.closed
+
+
+def test_invoke_extracts_the_answer():
+    assert invoke_efficient_query(FakeBedrock([SQL, CLOSING_TAG, ' because']), '{}', 'model') == SQL
+    assert invoke_efficient_query(FakeBedrock([' no change needed']), '{}', 'model') == NO_CHANGE
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_refine_request(monkeypatch, streaming):
+    pytest.importorskip('boto3')
+    import querydatabaselambda
+
+    requests = []
+
+    def refine(client, body, model_id):
+        requests.append(json.loads(body))
+        return SQL
+
+    monkeypatch.setattr(querydatabaselambda, 'REFINE_STREAMING', streaming)
+    monkeypatch.setattr(querydatabaselambda, 'get_client', lambda service_name, **config: FakeBedrock([]))
+    monkeypatch.setattr(querydatabaselambda, 'stream_efficient_query', refine)
+    monkeypatch.setattr(querydatabaselambda, 'invoke_efficient_query', refine)
+    monkeypatch.setattr(querydatabaselambda.schema_catalog, 'get', lambda: {})
+    assert querydatabaselambda.refineSQL('select * from lung_cancer_cases', 'How many survived?') == SQL
+    [request] = requests
+    assert request['messages'][-1] == {'role': 'assistant', 'content': '<efficientQuery>'}
+    # A stop sequence would hide the closing tag the streaming parser stops on
+    assert ('stop_sequences' in request) is not streaming
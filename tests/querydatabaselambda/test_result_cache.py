@@ -0,0 +1,138 @@
+import pytest
+
+import result_cache
+from fake_data_api import FakeDataClient
+from redshift_data import ColumnarResult, StatementWaiter, read_columnar_result
+from result_cache import FileResultStore, ResultCache, normalize_sql
+
+VERSION_SQL = 'select table_id, tbl_rows, size from svv_table_info'
+
+
+def table_version(client):
+    """The version lookup of the Lambda, against ``client``."""
+    def fetch():
+        statement_id = client.execute_statement(Sql=VERSION_SQL)['Id']
+        StatementWaiter(client, initial_delay=0).wait(statement_id)
+        return ':'.join(str(value) for value in client.get_statement_result(Id=statement_id)['Records'][0])
+    return fetch
+
+
+def make_result(rows):
+    return ColumnarResult.from_rows(['case_id', 'gdf15'], ['varchar', 'float8'], [[f'R01-{i}', i / 2] for i in range(rows)])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def client():
+    return FakeDataClient({'svv_table_info': ([('table_id', 'int8'), ('tbl_rows', 'int8')], [(101, 500)])})
+
+
+@pytest.mark.parametrize('sql', [
+    'SELECT gdf15 FROM clinical_genomic WHERE case_id IN (\'R01-2\', \'R01-1\');',
+    'select  gdf15\nfrom dev.public.clinical_genomic where case_id in(\'R01-1\',\'R01-2\')',
+    'select gdf15 from "public".clinical_genomic where case_id in ( \'R01-1\' , \'R01-2\' ) ;',
+])
+def test_normalize_sql_merges_spellings(sql):
+    assert normalize_sql(sql) == "select gdf15 from clinical_genomic where case_id in('R01-1','R01-2')"
+
+
+def test_normalize_sql_keeps_string_literals():
+    assert normalize_sql("select * from t where gender = 'Male  X'") != normalize_sql("select * from t where gender = 'male x'")
+
+
+def test_hits_follow_normalized_sql(client):
+    cache = ResultCache(table_version(client))
+    result = make_result(3)
+    cache.put('select * from clinical_genomic', result)
+    assert cache.get('SELECT *  FROM clinical_genomic;') is result
+    assert cache.get('select case_id from clinical_genomic') is None
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+    # The version is fetched once per version_ttl
+    assert client.executed.count(VERSION_SQL) == 1
+
+
+def test_least_recently_used_entry_is_evicted(client):
+    cache = ResultCache(table_version(client), max_entries=2)
+    for query in ('select 1', 'select 2'):
+        cache.put(query, make_result(1))
+    cache.get('select 1')
+    cache.put('select 3', make_result(1))
+    assert cache.get('select 2') is None
+    assert cache.get('select 1') is not None and cache.get('select 3') is not None
+
+
+def test_entries_expire_after_ttl(client, clock):
+    cache = ResultCache(table_version(client), ttl=60, version_ttl=3600)
+    cache.put('select 1', make_result(1))
+    clock[0] += 59
+    assert cache.get('select 1') is not None
+    clock[0] += 2
+    assert cache.get('select 1') is None
+
+
+def test_large_results_are_not_cached(client):
+    cache = ResultCache(table_version(client), max_rows=10)
+    cache.put('select 10', make_result(10))
+    cache.put('select 11', make_result(11))
+    assert cache.get('select 10') is not None
+    assert cache.get('select 11') is None
+
+
+def test_new_table_version_drops_entries(client, clock):
+    cache = ResultCache(table_version(client), version_ttl=300)
+    cache.put('select 1', make_result(1))
+    client.results['svv_table_info'] = ([('table_id', 'int8'), ('tbl_rows', 'int8')], [(101, 501)])
+    assert cache.get('select 1') is not None
+    clock[0] += 300
+    assert cache.get('select 1') is None
+
+
+def test_failed_version_lookup_bypasses_the_cache(client):
+    client.results['svv_table_info'] = RuntimeError('permission denied for svv_table_info')
+    cache = ResultCache(table_version(client))
+    cache.put('select 1', make_result(1))
+    assert cache.get('select 1') is None
+    assert cache.stats['version_errors'] == 2
+    # The lookup is retried and the cache works again once it succeeds
+    client.results['svv_table_info'] = ([('table_id', 'int8')], [(101,)])
+    cache.put('select 1', make_result(1))
+    assert cache.get('select 1') is not None
+
+
+def test_store_is_shared_between_caches(client, tmp_path):
+    store = FileResultStore(str(tmp_path))
+    ResultCache(table_version(client), store=store).put('select * from clinical_genomic', make_result(3))
+    cache = ResultCache(table_version(client), store=store)
+    result = cache.get('select * from clinical_genomic')
+    assert cache.stats['store_hits'] == 1
+    assert list(result.rows()) == list(make_result(3).rows())
+
+
+def test_query_succeeds_when_version_lookup_fails(monkeypatch):
+    pytest.importorskip('boto3')
+    import querydatabaselambda
+
+    client = FakeDataClient({
+        'svv_table_info': RuntimeError('statement timed out'),
+        'from clinical_genomic': ([('case_id', 'varchar'), ('gdf15', 'float8')], [('R01-1', 1.5)]),
+    })
+    monkeypatch.setattr(querydatabaselambda, 'redshift_client', client)
+    monkeypatch.setattr(querydatabaselambda, 'statement_waiter', StatementWaiter(client, initial_delay=0))
+    monkeypatch.setattr(querydatabaselambda, 'SQL_VALIDATION', False)
+    monkeypatch.setattr(querydatabaselambda, 'result_cache', ResultCache(querydatabaselambda.get_table_version))
+    result = querydatabaselambda.query_redshift('select case_id, gdf15 from clinical_genomic')
+    assert list(result.rows()) == [['R01-1', 1.5]]
+
+
+def test_read_columnar_result_pages(client):
+    client.page_size = 2
+    client.results['clinical_genomic'] = ([('case_id', 'varchar')], [(f'R01-{i}',) for i in range(5)])
+    statement_id = client.execute_statement(Sql='select case_id from clinical_genomic')['Id']
+    result = read_columnar_result(client, statement_id)
+    assert [row[0] for row in result.rows()] == [f'R01-{i}' for i in range(5)]
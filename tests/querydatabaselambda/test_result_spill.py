@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from redshift_data import ColumnarResult
+from result_spill import build_npz_spill, encode_npy
+
+COLUMNS = ['case_id', 'gdf15', 'pack_years', 'survival_status', 'ethnicity']
+TYPES = ['varchar', 'float8', 'int4', 'bool', 'varchar']
+ROWS = [
+    ['R01-001', 1.25, 20, True, 'Hispanic/Latino'],
+    ['R01-002', None, None, False, None],
+    ['AMC-003', -0.5, 0, None, 'Müller – 東京 😀'],
+]
+
+
+def load(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def test_npz_round_trip():
+    data, manifest = build_npz_spill(ColumnarResult.from_rows(COLUMNS, TYPES, ROWS), 'results/q.npz')
+    archive = load(data)
+    assert manifest['row_count'] == 3
+    assert manifest['byte_size'] == len(data)
+    assert [column['name'] for column in manifest['columns']] == COLUMNS
+    columns = {column['name']: column for column in manifest['columns']}
+
+    case_id = archive[columns['case_id']['entry']]
+    assert case_id.tolist() == ['R01-001', 'R01-002', 'AMC-003']
+    assert not columns['case_id']['nulls']
+
+    gdf15 = archive[columns['gdf15']['entry']]
+    assert gdf15.dtype == np.float64
+    assert gdf15[0] == 1.25 and np.isnan(gdf15[1]) and gdf15[2] == -0.5
+    assert archive[columns['gdf15']['entry'] + '_null'].tolist() == [False, True, False]
+
+    pack_years = archive[columns['pack_years']['entry']]
+    assert pack_years.dtype == np.int64
+    assert pack_years.tolist() == [20, 0, 0]
+    assert archive[columns['pack_years']['entry'] + '_null'].tolist() == [False, True, False]
+
+    status = archive[columns['survival_status']['entry']]
+    assert status.dtype == np.bool_
+    assert status.tolist() == [True, False, False]
+    assert archive[columns['survival_status']['entry'] + '_null'].tolist() == [False, False, True]
+
+    # Nulls of string columns are empty strings with a mask; characters outside
+    # ASCII and the Basic Multilingual Plane keep their code points
+    ethnicity = archive[columns['ethnicity']['entry']]
+    assert ethnicity.tolist() == ['Hispanic/Latino', '', 'Müller – 東京 😀']
+    assert archive[columns['ethnicity']['entry'] + '_null'].tolist() == [False, True, False]
+
+
+def test_empty_result_round_trip():
+    data, manifest = build_npz_spill(ColumnarResult.from_rows(COLUMNS, TYPES, []), 'results/empty.npz')
+    archive = load(data)
+    assert manifest['row_count'] == 0
+    for column in manifest['columns']:
+        assert archive[column['entry']].shape == (0,)
+        assert not column['nulls']
+
+
+@pytest.mark.parametrize('length', [0, 1, 1000])
+def test_npy_header_is_aligned(length):
+    data = encode_npy('<f8', length, np.arange(length, dtype='<f8').tobytes())
+    header_length = int.from_bytes(data[8:10], 'little')
+    assert (10 + header_length) % 64 == 0
+    assert np.load(io.BytesIO(data)).tolist() == list(range(length))
@@ -0,0 +1,139 @@
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+import querydatabaselambda
+from querydatabaselambda import MAX_INLINE_BYTES, serialize_result
+from redshift_data import ColumnarResult
+
+
+class FakeObject:
+    def __init__(self, store, bucket, key):
+        self.store = store
+        self.bucket = bucket
+        self.key = key
+
+    def put(self, Body):
+        self.store[(self.bucket, self.key)] = Body
+
+
+class FakeS3Resource:
+    def __init__(self):
+        self.objects = {}
+
+    def Object(self, bucket, key):
+        return FakeObject(self.objects, bucket, key)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    resource = FakeS3Resource()
+    monkeypatch.setenv('BUCKET_NAME', 'results-bucket')
+    monkeypatch.setattr(querydatabaselambda, 'get_resource', lambda service_name: resource)
+    return resource
+
+
+def refine_event():
+    return {
+        'actionGroup': 'redshift',
+        'apiPath': '/refinesql',
+        'httpMethod': 'POST',
+        'parameters': [{'name': 'sql', 'value': 'select 1'}, {'name': 'question', 'value': 'q'}],
+    }
+
+
+def query_event():
+    return {
+        'actionGroup': 'redshift',
+        'apiPath': '/queryredshift',
+        'httpMethod': 'POST',
+        'parameters': [{'name': 'query', 'value': 'select case_id, note from clinical_genomic'}],
+    }
+
+
+def body(response):
+    return response['response']['responseBody']['application/json']['body']
+
+
+def multibyte_text(size):
+    # Two UTF-8 bytes per character, so the limit is reached at half as many characters
+    text = 'é' * (size // 2) + 'x' * (size % 2)
+    assert len(text.encode('utf-8')) == size
+    return text
+
+
+def columnar_result(note):
+    return ColumnarResult.from_rows(['case_id', 'note'], ['varchar', 'varchar'], [['R01-001', note]])
+
+
+def columnar_text(size):
+    """A note whose result serializes to exactly size bytes of JSON."""
+    # Rows are JSON with non-ASCII characters escaped, so each of these takes six bytes
+    prefix = 'Müller – 東京 '
+    base = len(''.join(columnar_result(prefix).iter_json_chunks()).encode('utf-8'))
+    return prefix + 'x' * (size - base)
+
+
+@pytest.mark.parametrize('size', [MAX_INLINE_BYTES - 1, MAX_INLINE_BYTES])
+def test_multibyte_string_at_the_limit_is_inlined(s3, monkeypatch, size):
+    text = multibyte_text(size)
+    assert len(text) < MAX_INLINE_BYTES
+    monkeypatch.setattr(querydatabaselambda, 'refineSQL', lambda sql, question: text)
+    response = querydatabaselambda.lambda_handler(refine_event(), None)
+    assert response['response']['httpStatusCode'] == 200
+    assert body(response) == text
+    assert not s3.objects
+
+
+def test_multibyte_string_over_the_limit_is_spilled(s3, monkeypatch):
+    # Fewer characters than the limit but one byte more once encoded
+    text = multibyte_text(MAX_INLINE_BYTES + 1)
+    assert len(text) < MAX_INLINE_BYTES
+    monkeypatch.setattr(querydatabaselambda, 'refineSQL', lambda sql, question: text)
+    response = querydatabaselambda.lambda_handler(refine_event(), None)
+    assert response['response']['httpStatusCode'] == 200
+    assert body(response).startswith('Result uploaded to S3. Bucket: results-bucket, Key: ')
+    [(bucket, key)] = s3.objects
+    assert body(response).endswith(key)
+    assert s3.objects[(bucket, key)].decode('utf-8') == text
+
+
+def test_serialize_result_stops_after_the_limit():
+    result = [multibyte_text(1000) for _ in range(100)]
+    chunks, size, remaining = serialize_result(result, MAX_INLINE_BYTES)
+    assert size == sum(len(chunk) for chunk in chunks)
+    assert MAX_INLINE_BYTES < size < 2 * MAX_INLINE_BYTES
+    # Finishing the serialization gives the same bytes as a single pass
+    chunks.extend(chunk.encode('utf-8') for chunk in remaining)
+    assert json.loads(b''.join(chunks)) == result
+
+
+@pytest.mark.parametrize('size, spilled', [(MAX_INLINE_BYTES, False), (MAX_INLINE_BYTES + 1, True)])
+def test_columnar_result_at_the_limit(s3, monkeypatch, size, spilled):
+    result = columnar_result(columnar_text(size))
+    monkeypatch.setattr(querydatabaselambda, 'query_redshift', lambda query: result)
+    monkeypatch.setattr(querydatabaselambda, 'SPILL_FORMAT', 'json')
+    response = querydatabaselambda.lambda_handler(query_event(), None)
+    text = ''.join(result.iter_json_chunks())
+    assert len(text.encode('utf-8')) == size
+    if spilled:
+        [data] = s3.objects.values()
+        assert data.decode('utf-8') == text
+        assert json.loads(data)['rows'][0][1].startswith('Müller – 東京')
+    else:
+        assert body(response) == text
+        assert not s3.objects
+
+
+def test_columnar_result_over_the_limit_is_spilled_as_npz(s3, monkeypatch):
+    result = columnar_result(columnar_text(MAX_INLINE_BYTES + 1))
+    monkeypatch.setattr(querydatabaselambda, 'query_redshift', lambda query: result)
+    monkeypatch.setattr(querydatabaselambda, 'SPILL_FORMAT', 'npz')
+    response = querydatabaselambda.lambda_handler(query_event(), None)
+    manifest_key = body(response).rsplit('Key: ', 1)[1]
+    manifest = json.loads(s3.objects[('results-bucket', manifest_key)])
+    assert manifest['format'] == 'npz'
+    assert manifest['row_count'] == 1
+    assert ('results-bucket', manifest['data_key']) in s3.objects
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from sql_validation import SQLValidationError, analyze, cap_unaggregated_query, validate_query
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+MAX_ROWS = 100001
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+SCHEMA = load_fixture('clinical_genomic_schema.json')
+# Queries generated for the sample questions of the Streamlit app
+CORPUS = load_fixture('sample_question_queries.json')
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['sql'][:60] for case in CORPUS])
+def test_sample_question_queries(case):
+    estimate = validate_query(case['sql'], SCHEMA, other_tables=['chemotherapy_survival'])
+    assert estimate['shape'] == case['shape']
+    capped = cap_unaggregated_query(case['sql'], estimate, MAX_ROWS)
+    assert capped.endswith(f' LIMIT {MAX_ROWS}') == case['capped']
+    if not case['capped']:
+        assert capped == case['sql']
+
+
+@pytest.mark.parametrize('sql, limit', [
+    ('select top 5 case_id from clinical_genomic', 5),
+    ('select distinct top 3 gdf15 from clinical_genomic where chemotherapy = \'Yes\'', 3),
+    ('select case_id from clinical_genomic order by gdf15 fetch first 2 rows only', 2),
+    ('select case_id from clinical_genomic order by gdf15 fetch next row only', 1),
+    ('select case_id from clinical_genomic limit 7;', 7),
+    ('select case_id from clinical_genomic limit all', None),
+])
+def test_existing_row_limits_are_kept(sql, limit):
+    estimate = validate_query(sql, SCHEMA)
+    assert estimate['shape'] == 'limited'
+    assert estimate['limit'] == limit
+    assert cap_unaggregated_query(sql, estimate, MAX_ROWS) == sql
+
+
+def test_limit_in_subquery_does_not_limit_outer_query():
+    sql = 'select * from (select top 5 case_id from clinical_genomic) t'
+    assert analyze(sql).estimate(1)['shape'] == 'full_scan'
+    assert cap_unaggregated_query(sql, validate_query(sql, SCHEMA), MAX_ROWS).endswith(f' LIMIT {MAX_ROWS}')
+
+
+@pytest.mark.parametrize('sql, shape', [
+    ('select avg(gdf15::float8) from clinical_genomic', 'single_row'),
+    ('select avg(survival_status::int4) from clinical_genomic', 'single_row'),
+    ('select case_id, gdf15::decimal(10, 2) from clinical_genomic where pack_years::float8 > 10', 'filtered_scan'),
+    ('select datediff(week, current_date, current_date) from clinical_genomic', 'full_scan'),
+    ('select dateadd(quarter, 1, current_date) from clinical_genomic limit 1', 'limited'),
+    ('select extract(epoch from current_timestamp) from clinical_genomic limit 1', 'limited'),
+    ('select extract(dow from current_date), extract(doy from current_date) from clinical_genomic limit 1', 'limited'),
+    ('select approximate count(distinct case_id) from clinical_genomic', 'single_row'),
+    ('select approximate percentile_disc(0.5) within group (order by gdf15) from clinical_genomic', 'single_row'),
+])
+def test_redshift_syntax_is_accepted(sql, shape):
+    assert validate_query(sql, SCHEMA)['shape'] == shape
+
+
+@pytest.mark.parametrize('sql, column', [
+    ('select avg(gdf16::float8) from clinical_genomic', 'gdf16'),
+    ('select datediff(week, surgery_date, current_date) from clinical_genomic', 'surgery_date'),
+    ('select approximate count(distinct patient) from clinical_genomic', 'patient'),
+])
+def test_columns_next_to_redshift_syntax_are_checked(sql, column):
+    with pytest.raises(SQLValidationError, match=f"Unknown column '{column}'"):
+        validate_query(sql, SCHEMA)
+
+
+def test_unknown_column_is_rejected_with_suggestion():
+    with pytest.raises(SQLValidationError, match='gdf15'):
+        validate_query('select gdf16 from clinical_genomic', SCHEMA)
@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+for module in ('lifelines', 'plotly', 'kaleido', 'boto3'):
+    pytest.importorskip(module)
+
+from app import fit_km_groups, fit_km_lifelines
+
+rng = np.random.default_rng(11)
+
+CASES = {
+    # Durations rounded to whole days, so many patients share a time
+    'ties': (np.round(rng.exponential(30, 300)), rng.integers(0, 2, 300)),
+    'zero_durations': (np.concatenate([np.zeros(5), rng.exponential(30, 95)]), rng.integers(0, 2, 100)),
+    'all_censored': (rng.exponential(30, 50), np.zeros(50, dtype=int)),
+    'all_events': (rng.exponential(30, 50), np.ones(50, dtype=int)),
+    'single_patient': (np.array([12.0]), np.array([1])),
+    'last_time_all_events': (np.array([1.0, 2, 2, 3, 3]), np.array([0, 1, 0, 1, 1])),
+}
+
+
+def assert_matches_lifelines(name, frame, durations, events):
+    expected = fit_km_lifelines(name, durations, events)
+    columns = ['timeline', name, f'{name}_lower_0.95', f'{name}_upper_0.95']
+    assert len(frame) == len(expected)
+    for column in columns:
+        np.testing.assert_allclose(frame[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12,
+                                   err_msg=column)
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_single_group_matches_lifelines(case):
+    durations, events = CASES[case]
+    frame = fit_km_groups({case: (durations, events)})[case]
+    assert_matches_lifelines(case, frame, durations, events)
+
+
+def test_multiple_groups_match_lifelines():
+    groups = {name: CASES[name] for name in ('ties', 'zero_durations', 'all_censored', 'all_events')}
+    frames = fit_km_groups(groups)
+    assert list(frames) == list(groups)
+    for name, (durations, events) in groups.items():
+        assert_matches_lifelines(name, frames[name], durations, events)
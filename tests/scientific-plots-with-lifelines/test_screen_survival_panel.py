@@ -0,0 +1,54 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+for module in ('lifelines', 'plotly', 'kaleido', 'boto3'):
+    pytest.importorskip(module)
+
+from app import parse_column_names, screen_survival_panel
+
+
+@pytest.fixture
+def cohort():
+    rng = np.random.default_rng(7)
+    n = 120
+    gdf15 = rng.normal(size=n)
+    return pd.DataFrame({
+        'survival_status': rng.integers(0, 2, n),
+        'survival_duration': rng.exponential(np.exp(-gdf15)),
+        'gdf15': gdf15,
+        'lrig1': rng.normal(size=n),
+        'cdh2': rng.normal(size=n),
+        'time_to_death': rng.exponential(size=n),
+        'age_at_histological_diagnosis': rng.integers(40, 90, n),
+        'weight_lbs': rng.normal(170, 30, n),
+        'pack_years': rng.integers(0, 80, n),
+        'days_between_ct_and_surgery': rng.integers(0, 120, n),
+        'gender': rng.choice(['Male', 'Female'], n),
+    })
+
+
+@pytest.mark.parametrize('method', ['cox', 'logrank'])
+def test_clinical_and_outcome_columns_are_not_screened(cohort, method):
+    summary = screen_survival_panel(cohort, method=method)
+    assert sorted(summary.index) == ['cdh2', 'gdf15', 'lrig1']
+
+
+def test_biomarkers_restrict_the_screen(cohort):
+    summary = screen_survival_panel(cohort, biomarkers=['gdf15', 'pack_years'])
+    assert sorted(summary.index) == ['gdf15', 'pack_years']
+    # The FDR is adjusted over the screened columns only
+    assert summary['fdr'].max() <= 1
+    assert (summary['fdr'] >= summary['p']).all()
+
+
+def test_outcome_and_unknown_columns_are_rejected(cohort):
+    with pytest.raises(ValueError, match='time_to_death'):
+        screen_survival_panel(cohort, biomarkers=['gdf15', 'time_to_death'])
+    with pytest.raises(ValueError, match='gdf16'):
+        screen_survival_panel(cohort, biomarkers=['gdf16'])
+
+
+@pytest.mark.parametrize('value', ['["gdf15", "lrig1"]', '[gdf15, lrig1]', "['gdf15', 'lrig1']", 'gdf15,lrig1'])
+def test_parse_column_names(value):
+    assert parse_column_names(value) == ['gdf15', 'lrig1']
@@ -0,0 +1,122 @@
+import io
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from columnar_arrays import ArraySource, parse_reference
+from redshift_data import ColumnarResult
+from result_spill import build_npz_spill
+
+COLUMNS = ['case_id', 'survival_duration', 'survival_status']
+TYPES = ['varchar', 'float8', 'int4']
+ROWS = [
+    ['R01-001', 12.5, 1],
+    ['R01-002', None, 0],
+    ['R01-003', 30.0, None],
+]
+
+
+class InMemoryS3:
+    """The get_object/put_object subset of an S3 client, counting downloads."""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Bucket, Key] = Body
+
+    def get_object(self, Bucket, Key):
+        self.gets.append((Bucket, Key))
+        return {'Body': io.BytesIO(self.objects[Bucket, Key])}
+
+
+@pytest.fixture
+def s3():
+    return InMemoryS3()
+
+
+def put_json(s3, key, data):
+    s3.put_object(Bucket='results', Key=key, Body=json.dumps(data).encode('utf-8'))
+
+
+def test_parse_reference():
+    assert parse_reference('s3://results/q/1.json#gdf15') == ('results', 'q/1.json', 'gdf15')
+    assert parse_reference(' s3://results/q/1.npz ') == ('results', 'q/1.npz', None)
+    assert parse_reference('[1, 2, 3]') is None
+    assert parse_reference([1, 2, 3]) is None
+
+
+def test_inline_values():
+    source = ArraySource(InMemoryS3())
+    assert source.array('[1, 2.5]').tolist() == [1.0, 2.5]
+    assert source.array("[1, 0, 1]", dtype=int).tolist() == [1, 0, 1]
+    assert source.referenced is None
+
+
+def test_manifest_and_npz(s3):
+    data, manifest = build_npz_spill(ColumnarResult.from_rows(COLUMNS, TYPES, ROWS), 'q/1.npz')
+    s3.put_object(Bucket='results', Key='q/1.npz', Body=data)
+    put_json(s3, 'q/1.json', manifest)
+    source = ArraySource(s3)
+
+    durations = source.array('s3://results/q/1.json#survival_duration')
+    assert durations[0] == 12.5 and np.isnan(durations[1]) and durations[2] == 30.0
+    # Integer columns with nulls become floats with NaN
+    status = source.array('s3://results/q/1.json', name='survival_status')
+    assert status[:2].tolist() == [1.0, 0.0] and np.isnan(status[2])
+    assert source.array('s3://results/q/1.json#case_id', dtype=str).tolist() == ['R01-001', 'R01-002', 'R01-003']
+    assert source.referenced == ('results', 'q/1.json')
+    # The manifest and the archive are each downloaded once
+    assert s3.gets == [('results', 'q/1.json'), ('results', 'q/1.npz')]
+
+
+def test_json_rows(s3):
+    put_json(s3, 'q/2.json', {'columns': COLUMNS, 'rows': ROWS, 'row_count': 3, 'truncated': False})
+    source = ArraySource(s3)
+    durations = source.array('s3://results/q/2.json#survival_duration')
+    assert durations[0] == 12.5 and np.isnan(durations[1])
+    assert source.array('s3://results/q/2.json#case_id', dtype=str).tolist() == ['R01-001', 'R01-002', 'R01-003']
+    assert s3.gets == [('results', 'q/2.json')]
+
+
+def test_raw_npz(s3):
+    buffer = io.BytesIO()
+    np.savez(buffer, survival_duration=np.array([3.0, 4.5]), survival_status=np.array([1, 0]))
+    s3.put_object(Bucket='results', Key='q/3.npz', Body=buffer.getvalue())
+    source = ArraySource(s3)
+    assert source.array('s3://results/q/3.npz#survival_duration').tolist() == [3.0, 4.5]
+    assert source.array('s3://results/q/3.npz', name='survival_status', dtype=int).tolist() == [1, 0]
+
+
+def test_store_round_trip(s3):
+    source = ArraySource(s3)
+    references = source.store('groups', {'duration_a': np.array([1.0, 2.0]), 'event_a': np.array([True, False])})
+    assert set(references) == {'duration_a', 'event_a'}
+    assert references['duration_a'].startswith('s3://groups/survival-groups/')
+    reader = ArraySource(s3)
+    assert reader.array(references['duration_a']).tolist() == [1.0, 2.0]
+    assert reader.array(references['event_a'], dtype=bool).tolist() == [True, False]
+
+
+def test_unknown_column(s3):
+    put_json(s3, 'q/2.json', {'columns': COLUMNS, 'rows': ROWS, 'row_count': 3, 'truncated': False})
+    with pytest.raises(ValueError, match='Column gdf15 not found .* available: case_id, survival_duration'):
+        ArraySource(s3).array('s3://results/q/2.json#gdf15')
+
+
+def test_batch_spill_is_rejected(s3):
+    put_json(s3, 'q/4.json', [
+        {'query': 'select 1', 'result': {'columns': COLUMNS, 'rows': ROWS, 'row_count': 3, 'truncated': False}},
+        {'query': 'select 2', 'error': 'Unknown column'},
+    ])
+    with pytest.raises(ValueError, match='batch of 2 queries'):
+        ArraySource(s3).array('s3://results/q/4.json#survival_duration')
+
+
+def test_unsupported_object(s3):
+    put_json(s3, 'q/5.json', {'body': 'text'})
+    with pytest.raises(ValueError, match='Unsupported object'):
+        ArraySource(s3).array('s3://results/q/5.json#survival_duration')
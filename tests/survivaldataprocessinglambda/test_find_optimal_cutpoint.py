@@ -0,0 +1,72 @@
+import json
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('boto3')
+
+from survivaldataprocessinglambda import find_optimal_cutpoint
+
+
+def cohort(seed, patients=80):
+    rng = np.random.default_rng(seed)
+    biomarker = np.round(rng.normal(size=patients), 1)
+    # Whole-day durations, so event times are tied
+    durations = np.round(rng.exponential(np.exp(-0.7 * biomarker)) * 100) + 1
+    events = (rng.random(patients) < 0.75).astype(int)
+    return biomarker, durations, events
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('min_group_fraction', [0.1, 0.25])
+def test_best_cut_matches_logrank_test_over_every_candidate(seed, min_group_fraction):
+    statistics = pytest.importorskip('lifelines.statistics')
+    biomarker, durations, events = cohort(seed)
+    min_size = math.ceil(min_group_fraction * len(biomarker))
+    candidates = {}
+    for cut in np.unique(biomarker):
+        baseline = biomarker <= cut
+        if min(baseline.sum(), (~baseline).sum()) < min_size:
+            continue
+        candidates[cut] = statistics.logrank_test(
+            durations[baseline], durations[~baseline], events[baseline], events[~baseline]
+        )
+    best_cut = max(candidates, key=lambda cut: candidates[cut].test_statistic)
+
+    data = json.loads(find_optimal_cutpoint(biomarker, durations, events, min_group_fraction=min_group_fraction))
+    assert data['threshold'] == pytest.approx(best_cut)
+    assert data['test_statistic'] == pytest.approx(candidates[best_cut].test_statistic, rel=1e-9)
+    assert data['p_value'] == pytest.approx(candidates[best_cut].p_value, rel=1e-9)
+    # The adjustment for the search only makes the p-value larger
+    assert data['p_value'] <= data['adjusted_p_value'] <= 1
+    assert len(data['baseline']['durations']) == int((biomarker <= best_cut).sum())
+
+
+@pytest.mark.parametrize('min_group_fraction', [0.1, 0.3, 0.45])
+def test_groups_respect_min_group_fraction(min_group_fraction):
+    biomarker, durations, events = cohort(11, patients=101)
+    data = json.loads(find_optimal_cutpoint(biomarker, durations, events, min_group_fraction=min_group_fraction))
+    min_size = math.ceil(min_group_fraction * len(biomarker))
+    assert len(data['baseline']['durations']) >= min_size
+    assert len(data['condition']['durations']) >= min_size
+
+
+@pytest.mark.parametrize('min_group_fraction', [0, 0.5, -0.1, 0.7])
+def test_min_group_fraction_out_of_range_is_rejected(min_group_fraction):
+    biomarker, durations, events = cohort(0)
+    with pytest.raises(ValueError, match='min_group_fraction'):
+        find_optimal_cutpoint(biomarker, durations, events, min_group_fraction=min_group_fraction)
+
+
+def test_no_events_is_an_error():
+    biomarker, durations, _ = cohort(0)
+    with pytest.raises(ValueError, match='event'):
+        find_optimal_cutpoint(biomarker, durations, np.zeros(len(biomarker)))
+
+
+@pytest.mark.parametrize('biomarker', [[2.0] * 10, [1.0] * 9 + [3.0]])
+def test_too_few_distinct_values_is_an_error(biomarker):
+    _, durations, events = cohort(0, patients=10)
+    with pytest.raises(ValueError, match='enough patients in both groups'):
+        find_optimal_cutpoint(biomarker, durations, events, min_group_fraction=0.2)
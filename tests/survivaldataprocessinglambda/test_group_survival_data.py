@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('boto3')
+
+from survivaldataprocessinglambda import group_survival_data, group_survival_data_multi
+
+DURATIONS = [10, 20, 30, 40, 50, 60]
+EVENTS = [1, 0, 1, 1, 0, 1]
+
+
+def test_tied_quantiles_do_not_leave_empty_groups():
+    data = json.loads(group_survival_data_multi([1, 1, 1, 1, 5, 6], DURATIONS, EVENTS, groups=4))
+    assert data['thresholds'] == [1.0]
+    assert data['dropped_thresholds'] == [4.0]
+    assert [group['durations'] for group in data['groups']] == [[10, 20, 30, 40], [50, 60]]
+    assert [group['range'] for group in data['groups']] == ['<= 1', '> 1']
+
+
+def test_thresholds_outside_the_data_are_dropped():
+    data = json.loads(group_survival_data_multi([1, 2, 3, 4, 5, 6], DURATIONS, EVENTS, thresholds=[0, 3, 10]))
+    assert data['thresholds'] == [3.0]
+    assert data['dropped_thresholds'] == [0.0, 10.0]
+    assert [group['events'] for group in data['groups']] == [[1, 0, 1], [1, 0, 1]]
+
+
+def test_all_values_tied_is_an_error():
+    with pytest.raises(ValueError, match=r'cut points \[2\.0\]'):
+        group_survival_data_multi([2, 2, 2, 2], DURATIONS[:4], EVENTS[:4], groups=3)
+
+
+def test_quartiles_match_the_two_group_split():
+    biomarker = [0.5, 2.5, 1.5, 3.5, 4.5, 5.5, 6.5, 7.5]
+    durations = list(range(1, 9))
+    events = [1, 0] * 4
+    data = json.loads(group_survival_data_multi(biomarker, durations, events, groups=4))
+    assert data['dropped_thresholds'] == []
+    assert [len(group['durations']) for group in data['groups']] == [2, 2, 2, 2]
+    split = json.loads(group_survival_data(biomarker, durations, events, data['thresholds'][1]))
+    lower = data['groups'][0]['durations'] + data['groups'][1]['durations']
+    assert sorted(split['baseline']['durations']) == sorted(lower)